@@ -1,4 +1,5 @@
 # config/settings.py
+import os
 from typing import Final
 
 class Settings:
@@ -6,5 +7,7 @@ class Settings:
     TABLE_FORMAT: Final[str] = "pretty"
     MIN_SEGMENT_DURATION: Final[float] = 5.0
     MAX_WORKERS: Final[int] = 4
+    # Threads for passes that only read and hash files; they wait on the disk, not the CPU
+    IO_WORKERS: Final[int] = min(32, (os.cpu_count() or 1) + 4)
 
 settings = Settings()
\ No newline at end of file
@@ -1,21 +1,90 @@
 # core/db_editor.py
 import csv
+import io
 import logging
 import os
+import queue
+import re
 import time
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
-from typing import Any, Optional
-from tabulate import tabulate
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+from config.settings import settings
+
+_executor = ThreadPoolExecutor(max_workers=settings.MAX_WORKERS)
+
+_READ_QUERY_PREFIXES = ("select", "pragma", "explain")
+_SCHEMA_CHANGE_RE = re.compile(r"\b(create|alter|drop)\b", re.IGNORECASE)
+
+INSERT_BATCH_SIZE = 500
+RESULT_POLL_INTERVAL_MS = 50
+_BULK_INSERT_PROC = "::edf_toolkit::tree_insert_rows"
+_BULK_INSERT_SCRIPT = """
+namespace eval ::edf_toolkit {}
+proc %s {tree index keyed rows} {
+    foreach row $rows {
+        if {$keyed} {
+            $tree insert {} $index -id [lindex $row 0] -values [lrange $row 1 end]
+        } else {
+            $tree insert {} $index -values $row
+        }
+        if {$index ne "end"} { incr index }
+    }
+}
+""" % _BULK_INSERT_PROC
+
+def _insert_rows(tree: ttk.Treeview, rows, index=tk.END, keyed=False):
+    """Insert rows into a Treeview with one Tcl call per INSERT_BATCH_SIZE rows.
+
+    With `keyed` the first value of each row is used as the item id instead of being displayed.
+    """
+    if not tree.tk.call("info", "procs", _BULK_INSERT_PROC):
+        tree.tk.eval(_BULK_INSERT_SCRIPT)
+    rows = tuple(tuple(row) for row in rows)
+    for start in range(0, len(rows), INSERT_BATCH_SIZE):
+        tree.tk.call(_BULK_INSERT_PROC, tree._w, index, int(keyed), rows[start:start + INSERT_BATCH_SIZE])
+        if index != tk.END:
+            index += INSERT_BATCH_SIZE
+
+@dataclass
+class StatsSnapshot:
+    """Database statistics collected off the Tk thread."""
+    db_size_mb: float
+    stats: Dict[str, Any]
+
+def _format_table(rows, headers=None) -> str:
+    """Format a small two-column table in the bordered style of tabulate's "pretty" format."""
+    rows = [(str(key), str(value)) for key, value in rows]
+    cells = rows + [tuple(headers)] if headers else rows
+    key_width = max(len(key) for key, _ in cells)
+    value_width = max(len(value) for _, value in cells)
+    border = f"+-{'-' * key_width}-+-{'-' * value_width}-+"
+    lines = [border]
+    if headers:
+        lines += [f"| {headers[0]:^{key_width}} | {headers[1]:^{value_width}} |", border]
+    lines += [f"| {key:<{key_width}} | {value:>{value_width}} |" for key, value in rows]
+    lines.append(border)
+    return "\n".join(lines)
 
 class DBEditor:
+    PAGE_SIZE = 200
+    MAX_LOADED_ROWS = 5000
+    SCROLL_PREFETCH_EDGE = 0.9
+
     def __init__(self, master: tk.Toplevel, db_manager: Any, text_output: Optional[tk.Text] = None):
         self.master = master
         self.db_manager = db_manager
         self.text_output = text_output
         self.current_table = None
+        self._tree: Optional[ttk.Treeview] = None
+        self._tree_cache: Dict[Tuple[str, ...], ttk.Treeview] = {}
+        self._sql_pump_job: Optional[str] = None
+        self._results: queue.Queue = queue.Queue()
         self._setup_ui()
         self._load_tables()
+        self.master.after(RESULT_POLL_INTERVAL_MS, self._drain_results)
 
     def _setup_ui(self):
         self.master.title("Database Editor")
@@ -29,10 +98,22 @@ class DBEditor:
         self._create_stats_tab()
 
     def _load_tables(self):
-        self.table_listbox.delete(0, tk.END)
-        tables = self.db_manager.get_table_names()
-        for table in tables:
-            self.table_listbox.insert(tk.END, table)
+        self._sync_table_list(self.db_manager.get_table_names())
+
+    def _sync_table_list(self, tables):
+        """Приведение списка таблиц к `tables` с изменением только отличающегося хвоста."""
+        current = self.table_listbox.get(0, tk.END)
+        common = 0
+        for old_name, new_name in zip(current, tables):
+            if old_name != new_name:
+                break
+            common += 1
+        if common == len(current) == len(tables):
+            return
+        if common < len(current):
+            self.table_listbox.delete(common, tk.END)
+        if common < len(tables):
+            self.table_listbox.insert(tk.END, *tables[common:])
 
     def _create_table_viewer_tab(self):
         tab = ttk.Frame(self.notebook)
@@ -53,6 +134,10 @@ class DBEditor:
         self.table_data_frame = tk.Frame(main_frame)
         self.table_data_frame.pack(side="right", fill="both", expand=True, padx=5, pady=5)
 
+        self._rows_label = tk.Label(self.table_data_frame, font=('Arial', 8))
+        self._rows_label.pack(side="bottom")
+        self._setup_table_context_menu()
+
         toolbar = tk.Frame(tab)
         toolbar.pack(fill="x", padx=5, pady=5)
 
@@ -115,55 +200,132 @@ class DBEditor:
         self._display_table(table_name)
 
     def _display_table(self, table_name: str):
-        """Отображение содержимого таблицы."""
-
-        for widget in self.table_data_frame.winfo_children():
-            widget.destroy()
+        """Отображение содержимого таблицы.
 
+        Строки подгружаются страницами по мере прокрутки, в дереве
+        одновременно хранится не более MAX_LOADED_ROWS строк.
+        Виджеты переиспользуются для таблиц с одинаковым набором столбцов.
+        """
         try:
-            columns = self.db_manager.get_table_columns(table_name)
-            data = self.db_manager.get_table_data(table_name)
-            tree = ttk.Treeview(self.table_data_frame, columns=columns, show="headings")
-            for col in columns:
-                tree.heading(col, text=col)
-                tree.column(col, width=100, anchor=tk.W)
-            for row in data:
-                tree.insert("", tk.END, values=row)
-            scroll_y = ttk.Scrollbar(self.table_data_frame, orient="vertical", command=tree.yview)
-            scroll_y.pack(side="right", fill="y")
-            tree.configure(yscrollcommand=scroll_y.set)
-            scroll_x = ttk.Scrollbar(self.table_data_frame, orient="horizontal", command=tree.xview)
-            scroll_x.pack(side="bottom", fill="x")
-            tree.configure(xscrollcommand=scroll_x.set)
-            tree.pack(fill="both", expand=True)
-            self._setup_table_context_menu(tree, table_name)
-            tk.Label(self.table_data_frame,
-                     text=f"Loaded {len(data)} rows from table '{table_name}'",
-                     font=('Arial', 8)).pack(side="bottom")
+            columns = tuple(self.db_manager.get_table_columns(table_name))
+            tree = self._tree_cache.get(columns)
+            if tree is None:
+                tree = self._create_table_tree(columns)
+                self._tree_cache[columns] = tree
+            else:
+                tree.delete(*tree.get_children())
+                tree.yview_moveto(0)
+
+            if tree is not self._tree:
+                if self._tree is not None:
+                    self._tree.master.pack_forget()
+                tree.master.pack(fill="both", expand=True)
+
+            self.current_table = table_name
+            self._tree = tree
+            self._total_rows = self.db_manager.count_rows(table_name)
+            self._window_start = 0
+            self._loaded_rows = 0
+            self._load_next_page()
+            self._update_rows_label()
 
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load table data: {str(e)}")
             logging.error(f"Error displaying table {table_name}: {e}")
 
-    def _setup_table_context_menu(self, tree: ttk.Treeview, table_name: str):
-        """Настройка контекстного меню для таблицы.
-
-        Args:
-            tree: Виджет Treeview
-            table_name: Имя таблицы
-        """
-        menu = tk.Menu(self.master, tearoff=0)
-        menu.add_command(label="Copy", command=lambda: self._copy_table_data(tree))
-        menu.add_command(label="Refresh", command=lambda: self._display_table(table_name))
-        menu.add_command(label="Export to CSV", command=lambda: self._export_table(table_name))
+    def _create_table_tree(self, columns) -> ttk.Treeview:
+        """Создание Treeview с полосами прокрутки для заданного набора столбцов."""
+        container = tk.Frame(self.table_data_frame)
+        tree = ttk.Treeview(container, columns=columns, show="headings")
+        for col in columns:
+            tree.heading(col, text=col)
+            tree.column(col, width=100, anchor=tk.W)
+        scroll_y = ttk.Scrollbar(container, orient="vertical", command=tree.yview)
+        scroll_y.pack(side="right", fill="y")
+        tree.configure(yscrollcommand=lambda first, last: self._on_table_scroll(scroll_y, first, last))
+        scroll_x = ttk.Scrollbar(container, orient="horizontal", command=tree.xview)
+        scroll_x.pack(side="bottom", fill="x")
+        tree.configure(xscrollcommand=scroll_x.set)
+        tree.pack(fill="both", expand=True)
+        tree.bind("<Button-3>", self._show_table_context_menu)
+        return tree
+
+    def _on_table_scroll(self, scrollbar: ttk.Scrollbar, first: str, last: str):
+        """Синхронизация полосы прокрутки и подгрузка соседних страниц."""
+        scrollbar.set(first, last)
+        if float(last) >= self.SCROLL_PREFETCH_EDGE:
+            self._load_next_page()
+        elif float(first) <= 1 - self.SCROLL_PREFETCH_EDGE:
+            self._load_previous_page()
+
+    def _load_next_page(self):
+        """Добавление следующей страницы строк в конец дерева."""
+        if self._window_start + self._loaded_rows >= self._total_rows:
+            return
+        children = self._tree.get_children()
+        after_rowid = int(children[-1]) if children else None
+        rows = self.db_manager.get_table_page(self.current_table, self.PAGE_SIZE, after_rowid=after_rowid)
+        if not rows:
+            return
+        _insert_rows(self._tree, rows, keyed=True)
+        self._loaded_rows += len(rows)
 
-        def show_menu(event):
-            try:
-                menu.tk_popup(event.x_root, event.y_root)
-            finally:
-                menu.grab_release()
+        overflow = self._loaded_rows - self.MAX_LOADED_ROWS
+        if overflow > 0:
+            self._drop_rows(self._tree.get_children()[:overflow], from_top=True)
+        self._update_rows_label()
 
-        tree.bind("<Button-3>", show_menu)
+    def _load_previous_page(self):
+        """Возврат ранее выгруженной страницы строк в начало дерева."""
+        if self._window_start == 0:
+            return
+        children = self._tree.get_children()
+        rows = self.db_manager.get_table_page(self.current_table, min(self.PAGE_SIZE, self._window_start),
+                                              before_rowid=int(children[0]))
+        if not rows:
+            return
+        top = self._tree.yview()[0] * len(children)
+        _insert_rows(self._tree, rows, 0, keyed=True)
+        self._window_start = max(0, self._window_start - len(rows))
+        self._loaded_rows += len(rows)
+        self._tree.yview_moveto((top + len(rows)) / len(self._tree.get_children()))
+
+        overflow = self._loaded_rows - self.MAX_LOADED_ROWS
+        if overflow > 0:
+            self._drop_rows(self._tree.get_children()[-overflow:], from_top=False)
+        self._update_rows_label()
+
+    def _drop_rows(self, items, from_top: bool):
+        """Удаление строк, вышедших за пределы окна, с сохранением позиции прокрутки."""
+        children = len(self._tree.get_children())
+        top = self._tree.yview()[0] * children
+        self._tree.delete(*items)
+        self._loaded_rows -= len(items)
+        if from_top:
+            self._window_start += len(items)
+            top -= len(items)
+        self._tree.yview_moveto(max(0.0, top) / max(1, children - len(items)))
+
+    def _update_rows_label(self):
+        """Обновление подписи с диапазоном загруженных строк."""
+        first = self._window_start + 1 if self._loaded_rows else 0
+        self._rows_label.config(
+            text=f"Loaded rows {first}-{self._window_start + self._loaded_rows} "
+                 f"of {self._total_rows} from table '{self.current_table}'")
+
+    def _setup_table_context_menu(self):
+        """Создание единственного контекстного меню, общего для всех таблиц."""
+        self._ctx_menu = tk.Menu(self.master, tearoff=0)
+        self._ctx_menu.add_command(label="Copy", command=lambda: self._copy_table_data(self._tree))
+        self._ctx_menu.add_command(label="Refresh", command=lambda: self._display_table(self.current_table))
+        self._ctx_menu.add_command(label="Export to CSV", command=lambda: self._export_table(self.current_table))
+
+    def _show_table_context_menu(self, event):
+        """Показ контекстного меню таблицы."""
+        try:
+            self._ctx_menu.tk_popup(event.x_root, event.y_root)
+        finally:
+            self._ctx_menu.grab_release()
 
     def _copy_table_data(self, tree: ttk.Treeview):
         """Копирование данных из таблицы в буфер обмена.
@@ -176,13 +338,12 @@ class DBEditor:
             if not selected_items:
                 return
 
-            data = []
-            for item in selected_items:
-                values = tree.item(item, 'values')
-                data.append('\t'.join(str(v) for v in values))
+            buffer = io.StringIO()
+            writer = csv.writer(buffer, dialect='excel-tab', lineterminator='\n')
+            writer.writerows(tree.item(item, 'values') for item in selected_items)
 
             self.master.clipboard_clear()
-            self.master.clipboard_append('\n'.join(data))
+            self.master.clipboard_append(buffer.getvalue().rstrip('\n'))
         except Exception as e:
             messagebox.showerror("Error", f"Failed to copy data: {str(e)}")
             logging.error(f"Error copying table data: {e}")
@@ -190,33 +351,63 @@ class DBEditor:
     def _export_table(self, table_name: str):
         """Экспорт таблицы в CSV-файл.
 
+        Запись файла выполняется в фоновом потоке.
+
         Args:
             table_name: Имя таблицы для экспорта
         """
-        try:
-            file_path = filedialog.asksaveasfilename(
-                defaultextension=".csv",
-                filetypes=[("CSV Files", "*.csv")],
-                title=f"Export {table_name} to CSV"
-            )
-            if not file_path:
-                return
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=[("CSV Files", "*.csv")],
+            title=f"Export {table_name} to CSV"
+        )
+        if not file_path:
+            return
 
-            data = self.db_manager.get_table_data(table_name)
-            columns = self.db_manager.get_table_columns(table_name)
+        future = _executor.submit(self._export_table_io, file_path, table_name)
+        future.add_done_callback(
+            lambda f: self._post(self._export_table_done, table_name, file_path, f.exception()))
 
-            with open(file_path, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                writer.writerow(columns)
-                writer.writerows(data)
+    def _export_table_io(self, file_path: str, table_name: str):
+        """Запись содержимого таблицы в CSV-файл (выполняется вне потока Tk)."""
+        columns, rows = self.db_manager.iter_table_rows(table_name)
 
-            messagebox.showinfo("Success", f"Data exported to:\n{file_path}")
-            if self.text_output:
-                self.text_output.insert(tk.END, f"Exported table '{table_name}' to {file_path}\n")
+        with open(file_path, 'w', newline='', encoding='utf-8', buffering=1 << 20) as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows(rows)
 
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to export data:\n{str(e)}")
-            logging.error(f"Error exporting table {table_name}: {e}")
+    def _export_table_done(self, table_name: str, file_path: str, error: Optional[BaseException]):
+        """Сообщение о результате экспорта (выполняется в потоке Tk)."""
+        if error:
+            messagebox.showerror("Error", f"Failed to export data:\n{str(error)}")
+            logging.error(f"Error exporting table {table_name}: {error}")
+            return
+
+        messagebox.showinfo("Success", f"Data exported to:\n{file_path}")
+        if self.text_output:
+            self.text_output.insert(tk.END, f"Exported table '{table_name}' to {file_path}\n")
+
+    def _post(self, callback, *args):
+        """Передача вызова из фонового потока в главный цикл Tk через очередь."""
+        self._results.put((callback, args))
+
+    def _drain_results(self):
+        """Выполнение вызовов, переданных фоновыми потоками, в потоке Tk."""
+        try:
+            while True:
+                callback, args = self._results.get_nowait()
+                try:
+                    callback(*args)
+                except Exception as e:
+                    logging.error(f"Error handling background result: {e}")
+        except queue.Empty:
+            pass
+        try:
+            self.master.after(RESULT_POLL_INTERVAL_MS, self._drain_results)
+        except tk.TclError:
+            # Окно редактора уже закрыто
+            pass
 
     def _export_current_table(self):
         """Экспорт текущей выбранной таблицы."""
@@ -228,10 +419,8 @@ class DBEditor:
     def _refresh_tables(self):
         """Обновление списка таблиц."""
         try:
-            self.table_listbox.delete(0, tk.END)
             tables = self.db_manager.get_table_names()
-            for table in tables:
-                self.table_listbox.insert(tk.END, table)
+            self._sync_table_list(tables)
 
             if self.current_table and self.current_table in tables:
                 idx = tables.index(self.current_table)
@@ -249,33 +438,65 @@ class DBEditor:
             messagebox.showwarning("Warning", "Please enter a SQL query")
             return
 
+        # Предыдущий SELECT не должен дописывать строки в таблицу нового запроса
+        self._cancel_sql_pump()
+        is_read = query[:16].lower().startswith(_READ_QUERY_PREFIXES)
         try:
             cursor = self.db_manager.conn.cursor()
             cursor.execute(query)
-            for row in self.sql_results.get_children():
-                self.sql_results.delete(row)
+            self.sql_results.delete(*self.sql_results.get_children())
             self.sql_results["columns"] = []
-            if query.lower().strip().startswith(("select", "pragma", "explain")):
+            if is_read:
                 columns = [desc[0] for desc in cursor.description]
                 self.sql_results["columns"] = columns
                 for col in columns:
                     self.sql_results.heading(col, text=col)
                     self.sql_results.column(col, width=100)
-                for row in cursor.fetchall():
-                    self.sql_results.insert("", tk.END, values=row)
-                messagebox.showinfo("Success",
-                                    f"Query executed. Returned {len(self.sql_results.get_children())} rows")
+                self._start_sql_pump(cursor)
             else:
                 self.db_manager.conn.commit()
+                self.db_manager.invalidate_stats()
+                if _SCHEMA_CHANGE_RE.search(query):
+                    self.db_manager.invalidate_schema()
                 messagebox.showinfo("Success",
                                     f"Query executed. Rows affected: {cursor.rowcount}")
-            if not query.lower().strip().startswith(("select", "pragma", "explain")):
+            if not is_read:
                 self._refresh_tables()
                 self._show_db_stats()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to execute query:\n{str(e)}")
             logging.error(f"Error executing SQL query: {e}")
 
+    def _cancel_sql_pump(self):
+        """Остановка вывода результатов предыдущего запроса."""
+        if self._sql_pump_job:
+            self.master.after_cancel(self._sql_pump_job)
+            self._sql_pump_job = None
+
+    def _start_sql_pump(self, cursor):
+        """Вывод результатов запроса пакетами, между которыми Tk успевает перерисоваться."""
+        self._cancel_sql_pump()
+        row_count = 0
+
+        def pump():
+            nonlocal row_count
+            try:
+                batch = cursor.fetchmany(INSERT_BATCH_SIZE)
+            except Exception as e:
+                self._sql_pump_job = None
+                messagebox.showerror("Error", f"Failed to fetch query results:\n{str(e)}")
+                logging.error(f"Error fetching SQL query results: {e}")
+                return
+            if batch:
+                _insert_rows(self.sql_results, batch)
+                row_count += len(batch)
+                self._sql_pump_job = self.master.after_idle(pump)
+            else:
+                self._sql_pump_job = None
+                messagebox.showinfo("Success", f"Query executed. Returned {row_count} rows")
+
+        self._sql_pump_job = self.master.after_idle(pump)
+
     def _clear_sql(self):
         """Очистка редактора SQL."""
         self.sql_input.delete("1.0", tk.END)
@@ -323,52 +544,69 @@ class DBEditor:
             logging.error(f"Error loading SQL query: {e}")
 
     def _show_db_stats(self):
-        """Отображение статистики базы данных."""
+        """Отображение статистики базы данных.
+
+        Запросы к базе выполняются в фоновом потоке.
+        """
         if not hasattr(self, 'stats_text'):
             return
+        future = _executor.submit(self._collect_db_stats)
+        future.add_done_callback(lambda f: self._post(self._render_db_stats, f))
+
+    def _collect_db_stats(self) -> StatsSnapshot:
+        """Сбор статистики базы данных (выполняется вне потока Tk)."""
+        return StatsSnapshot(
+            db_size_mb=os.path.getsize(self.db_manager.db_path) / (1024 * 1024),
+            stats=self.db_manager.get_all_stats()
+        )
+
+    def _render_db_stats(self, future: Future):
+        """Вывод собранной статистики (выполняется в потоке Tk)."""
         self.stats_text.delete(1.0, tk.END)
+        parts = []
         try:
-            self.stats_text.insert(tk.END, "=== DATABASE STATISTICS ===\n\n")
-            db_size = os.path.getsize(self.db_manager.db_path) / (1024 * 1024)
-            self.stats_text.insert(tk.END, f"Database file: {self.db_manager.db_path}\n")
-            self.stats_text.insert(tk.END, f"Size: {db_size:.2f} MB\n\n")
-            stats = self.db_manager.get_database_stats()
-            self.stats_text.insert(tk.END, "=== RECORD COUNTS ===\n")
-            self.stats_text.insert(tk.END, tabulate([
+            snapshot = future.result()
+            collected = snapshot.stats
+            parts.append("=== DATABASE STATISTICS ===\n\n")
+            parts.append(f"Database file: {self.db_manager.db_path}\n")
+            parts.append(f"Size: {snapshot.db_size_mb:.2f} MB\n\n")
+            stats = collected['counts']
+            parts.append("=== RECORD COUNTS ===\n")
+            parts.append(_format_table([
                 ["Patients", stats['patients']],
                 ["EDF Files", stats['edf_files']],
                 ["Segments", stats['segments']],
                 ["Diagnoses", stats['diagnoses']]
-            ], headers=["Table", "Records"], tablefmt="pretty") + "\n\n")
-            seg_stats = self.db_manager.get_segment_duration_stats()
+            ], headers=["Table", "Records"]) + "\n\n")
+            seg_stats = collected['segments']
             if seg_stats:
-                self.stats_text.insert(tk.END, "=== SEGMENT DURATION STATISTICS ===\n")
-                self.stats_text.insert(tk.END, "Duration calculated as (end_time - start_time)\n")
-                self.stats_text.insert(tk.END, tabulate([
+                parts.append("=== SEGMENT DURATION STATISTICS ===\n")
+                parts.append("Duration calculated as (end_time - start_time)\n")
+                parts.append(_format_table([
                     ["Average duration", f"{seg_stats['avg']:.2f} sec"],
                     ["Shortest segment", f"{seg_stats['min']:.2f} sec"],
                     ["Longest segment", f"{seg_stats['max']:.2f} sec"]
-                ], tablefmt="pretty") + "\n\n")
+                ]) + "\n\n")
             else:
-                self.stats_text.insert(tk.END, "Segment duration statistics not available\n\n")
-            self.stats_text.insert(tk.END, "=== ADDITIONAL STATISTICS ===\n")
-            gender_stats = self.db_manager.get_gender_distribution()
+                parts.append("Segment duration statistics not available\n\n")
+            parts.append("=== ADDITIONAL STATISTICS ===\n")
+            gender_stats = collected['gender']
             if gender_stats:
-                self.stats_text.insert(tk.END, "\nGender Distribution:\n")
-                self.stats_text.insert(tk.END, tabulate(
+                parts.append("\nGender Distribution:\n")
+                parts.append(_format_table(
                     gender_stats.items(),
-                    headers=["Gender", "Count"],
-                    tablefmt="pretty") + "\n")
-            age_stats = self.db_manager.get_age_statistics()
+                    headers=["Gender", "Count"]) + "\n")
+            age_stats = collected['age']
             if age_stats:
-                self.stats_text.insert(tk.END, "\nPatient Age Statistics:\n")
-                self.stats_text.insert(tk.END, tabulate([
+                parts.append("\nPatient Age Statistics:\n")
+                parts.append(_format_table([
                     ["Average age", f"{age_stats['avg']:.1f} years"],
                     ["Youngest patient", f"{age_stats['min']} years"],
                     ["Oldest patient", f"{age_stats['max']} years"]
-                ], tablefmt="pretty") + "\n")
-            self.stats_text.insert(tk.END, f"\nReport generated: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
+                ]) + "\n")
+            parts.append(f"\nReport generated: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
         except Exception as e:
             error_msg = f"Error retrieving database stats: {str(e)}"
-            self.stats_text.insert(tk.END, error_msg + "\n")
-            logging.error(f"Error showing DB stats: {e}")
\ No newline at end of file
+            parts.append(error_msg + "\n")
+            logging.error(f"Error showing DB stats: {e}")
+        self.stats_text.insert(tk.END, "".join(parts))
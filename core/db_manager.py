@@ -1,14 +1,24 @@
 # core/db_manager.py
 import os
+import re
 import sqlite3
+import threading
+from contextlib import contextmanager
 from datetime import datetime
+import functools
 import hashlib
 import logging
-from typing import Optional, Dict, List, Tuple
+import time
+from typing import Any, Callable, Optional, Dict, FrozenSet, Iterator, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 
+from config.settings import settings
+
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
+_NON_WORD_RE = re.compile(r"\W")
+
 @dataclass
 class Patient:
     patient_id: int
@@ -47,8 +57,26 @@ class Diagnosis:
     ds_descript: str
     notes: str = ""
 
+def _cached_stats(method):
+    """Memoize a statistics query until the TTL expires or the data changes."""
+    @functools.wraps(method)
+    def wrapper(self):
+        return self._cached(method.__name__, lambda: method(self))
+    return wrapper
+
 class DBManager:
     """Database manager for storing and retrieving data."""
+    STATS_CACHE_TTL = 30.0
+    # Single-writer desktop workload: WAL lets readers run alongside inserts and
+    # synchronous=NORMAL avoids an fsync on every commit.
+    CONNECTION_PRAGMAS = (
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA cache_size=-65536",
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA mmap_size=268435456",
+    )
+
     def __init__(self, directory: str = ""):
         """Initialize the database manager."""
         self.directory = os.path.join(directory, "DB") if directory else "DB"
@@ -56,9 +84,78 @@ class DBManager:
         self.db_path = os.path.join(self.directory, "eeg_database.db")
         self.segments_dir = os.path.join(self.directory, "segments")
         os.makedirs(self.segments_dir, exist_ok=True)
-        self.conn = None
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._stats_cache: Dict[str, Tuple[int, float, Any]] = {}
+        self._write_epoch = 0
+        self._table_names: Optional[List[str]] = None
+        self._quoted_tables: Optional[Dict[str, str]] = None
+        self._schema_cache: Dict[str, List[str]] = {}
         self._initialize_db()
 
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Connection bound to the calling thread, opened on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            for pragma in self.CONNECTION_PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def batch_context(self):
+        """Group the writes made on the calling thread into one transaction.
+
+        Nested contexts join the outer transaction; the outermost one commits on
+        success and rolls back on error.
+        """
+        depth = getattr(self._local, 'tx_depth', 0)
+        if depth == 0:
+            self.conn.execute("BEGIN IMMEDIATE")
+        self._local.tx_depth = depth + 1
+        try:
+            yield self
+        except BaseException:
+            self._local.tx_depth = depth
+            if depth == 0:
+                self.conn.rollback()
+            raise
+        self._local.tx_depth = depth
+        if depth == 0:
+            self.conn.commit()
+            self.invalidate_stats()
+
+    def _commit(self):
+        """Commit unless the calling thread is inside batch_context."""
+        if not getattr(self._local, 'tx_depth', 0):
+            self.conn.commit()
+
+    def _cached(self, key: str, fn: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """Return the cached result of `fn` stored under `key`, recomputing it once stale.
+
+        Entries are tagged with the write epoch they were computed in, so a result
+        that raced with a write on another thread is never served afterwards.
+        """
+        ttl = self.STATS_CACHE_TTL if ttl is None else ttl
+        now = time.monotonic()
+        epoch = self._write_epoch
+        entry = self._stats_cache.get(key)
+        if entry and entry[0] == epoch and now - entry[1] < ttl:
+            return entry[2]
+        value = fn()
+        self._stats_cache[key] = (epoch, now, value)
+        return value
+
+    def invalidate_stats(self):
+        """Drop cached statistics after the database contents change."""
+        self._write_epoch += 1
+        self._stats_cache.clear()
+
     def _initialize_db(self):
         """Initialize database connection and create tables if they don't exist."""
         db_dir = os.path.dirname(self.db_path)
@@ -66,7 +163,6 @@ class DBManager:
             os.makedirs(db_dir)
             logging.info(f"Created database directory: {db_dir}")
 
-        self.conn = sqlite3.connect(self.db_path)
         self._create_tables()
 
     def _create_tables(self):
@@ -127,12 +223,21 @@ class DBManager:
             FOREIGN KEY (patient_id) REFERENCES patients (patient_id)
         )
         """)
+
+        # Indexes for foreign key lookups, patient lookup by name and segment
+        # duration aggregation. diagnosis.patient_id is already covered by its
+        # primary key, edf_files.file_hash and segments.seg_fpath by their
+        # UNIQUE constraints.
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_patients_name ON patients (name)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_edf_files_patient_id ON edf_files (patient_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_segments_edf_id ON segments (edf_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_segments_times ON segments (start_time, end_time)")
         self.conn.commit()
 
     def get_last_record(self, table_name: str):
         """Get the last record from a table."""
         cursor = self.conn.cursor()
-        cursor.execute(f"SELECT * FROM {table_name} ORDER BY ROWID DESC LIMIT 1")
+        cursor.execute(f"SELECT * FROM {self._quote_table(table_name)} ORDER BY ROWID DESC LIMIT 1")
         return cursor.fetchone()
 
     def database_size(self) -> int:
@@ -140,24 +245,93 @@ class DBManager:
         return os.path.getsize(self.db_path)
 
     def get_table_names(self):
-        """Возвращает список всех таблиц в базе данных."""
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        tables = [table[0] for table in cursor.fetchall()]
-        cursor.close()
-        return tables
+        """Возвращает список всех таблиц в базе данных (кэшируется до invalidate_schema)."""
+        if self._table_names is None:
+            cursor = self.conn.cursor()
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
+            self._table_names = [table[0] for table in cursor.fetchall()]
+            cursor.close()
+        return list(self._table_names)
 
     def get_table_data(self, table_name: str) -> List[Tuple]:
-        """Get all data from a table."""
+        """Get all data from a table. Use get_table_page to read it page by page."""
         cursor = self.conn.cursor()
-        cursor.execute(f"SELECT * FROM {table_name}")
+        cursor.execute(f"SELECT * FROM {self._quote_table(table_name)}")
         return cursor.fetchall()
 
-    def get_table_columns(self, table_name: str) -> List[str]:
-        """Get column names from a table."""
+    def get_table_page(self, table_name: str, limit: int, after_rowid: Optional[int] = None,
+                       before_rowid: Optional[int] = None) -> List[Tuple]:
+        """Get a page of `limit` rows ordered by rowid, each prefixed with its rowid.
+
+        Uses keyset pagination: the page starts right after `after_rowid` or ends
+        right before `before_rowid`, so SQLite seeks through the rowid index
+        instead of scanning and discarding every preceding row as OFFSET does.
+        """
+        table = self._quote_table(table_name)
+        cursor = self.conn.cursor()
+        if before_rowid is not None:
+            cursor.execute(f"SELECT rowid, * FROM {table} WHERE rowid < ? ORDER BY rowid DESC LIMIT ?",
+                           (before_rowid, limit))
+            return cursor.fetchall()[::-1]
+        if after_rowid is None:
+            cursor.execute(f"SELECT rowid, * FROM {table} ORDER BY rowid LIMIT ?", (limit,))
+        else:
+            cursor.execute(f"SELECT rowid, * FROM {table} WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                           (after_rowid, limit))
+        return cursor.fetchall()
+
+    def count_rows(self, table_name: str) -> int:
+        """Get the number of rows in a table."""
+        cursor = self.conn.cursor()
+        cursor.execute(f"SELECT COUNT(*) FROM {self._quote_table(table_name)}")
+        return cursor.fetchone()[0]
+
+    def iter_table_rows(self, table_name: str, batch_size: int = 1000) -> Tuple[List[str], Iterator[Tuple]]:
+        """Get column names and a lazy iterator over all rows of a table.
+
+        Rows are pulled from the cursor `batch_size` at a time, so the table is
+        never materialized in memory as a whole.
+        """
         cursor = self.conn.cursor()
-        cursor.execute(f"PRAGMA table_info({table_name})")
-        return [column[1] for column in cursor.fetchall()]
+        cursor.execute(f"SELECT * FROM {self._quote_table(table_name)}")
+        columns = [desc[0] for desc in cursor.description]
+
+        def rows():
+            try:
+                while batch := cursor.fetchmany(batch_size):
+                    yield from batch
+            finally:
+                cursor.close()
+
+        return columns, rows()
+
+    def get_table_columns(self, table_name: str) -> List[str]:
+        """Get column names from a table (cached until invalidate_schema)."""
+        columns = self._schema_cache.get(table_name)
+        if columns is None:
+            cursor = self.conn.cursor()
+            cursor.execute(f"PRAGMA table_info({self._quote_table(table_name)})")
+            columns = [column[1] for column in cursor.fetchall()]
+            self._schema_cache[table_name] = columns
+        return list(columns)
+
+    def _quote_table(self, table_name: str) -> str:
+        """Validate a table name against the schema and quote it for use in SQL.
+
+        Quoted identifiers are built once per schema and looked up afterwards.
+        """
+        if self._quoted_tables is None:
+            self._quoted_tables = {name: '"' + name.replace('"', '""') + '"' for name in self.get_table_names()}
+        quoted = self._quoted_tables.get(table_name)
+        if quoted is None:
+            raise ValueError(f"Unknown table: {table_name}")
+        return quoted
+
+    def invalidate_schema(self):
+        """Drop cached table and column names after the schema changes."""
+        self._table_names = None
+        self._quoted_tables = None
+        self._schema_cache.clear()
 
     def database_exists(self) -> bool:
         """Check if database file exists."""
@@ -180,13 +354,14 @@ class DBManager:
             "INSERT INTO patients (name, gender, birthday, note) VALUES (?, ?, ?, ?)",
             (name, gender, birthday, note)
         )
-        self.conn.commit()
+        self._commit()
+        self.invalidate_stats()
         return cursor.lastrowid
 
     def get_table_data_for_export(self, table_name):
         """Получить данные таблицы в виде списка списков."""
         cursor = self.conn.cursor()
-        cursor.execute(f"SELECT * FROM {table_name}")
+        cursor.execute(f"SELECT * FROM {self._quote_table(table_name)}")
         return cursor.fetchall()
 
     def add_edf_file(self, patient_id: int, file_hash: str, start_date: str,
@@ -208,7 +383,8 @@ class DBManager:
             "VALUES (?, ?, ?, ?, ?, ?, ?)",
             (patient_id, file_hash, start_date, eeg_ch, rate, montage, notes)
         )
-        self.conn.commit()
+        self._commit()
+        self.invalidate_stats()
         return cursor.lastrowid
 
     def add_segment(self, patient_id: int, edf_id: int, seg_fpath: str,
@@ -225,9 +401,32 @@ class DBManager:
             "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
             (patient_id, edf_id, seg_fpath, start_time, end_time, l_marker, r_marker, notes)
         )
-        self.conn.commit()
+        self._commit()
+        self.invalidate_stats()
         return cursor.lastrowid
 
+    def add_segments(self, segments: List[Tuple]) -> int:
+        """Add several segments to the database in a single transaction.
+
+        Each row is a (patient_id, edf_id, seg_fpath, start_time, end_time,
+        l_marker, r_marker, notes) tuple. Segments whose path is already stored
+        are skipped. Returns the number of inserted rows.
+        """
+        if not segments:
+            return 0
+        cursor = self.conn.cursor()
+        cursor.executemany(
+            "INSERT OR IGNORE INTO segments "
+            "(patient_id, edf_id, seg_fpath, start_time, end_time, l_marker, r_marker, notes) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            segments
+        )
+        self._commit()
+        self.invalidate_stats()
+        if cursor.rowcount < len(segments):
+            logging.warning(f"Skipped {len(segments) - cursor.rowcount} segments already present in database")
+        return cursor.rowcount
+
     def add_diagnosis(self, patient_id: int, ds_code: str, ds_descript: str, note: str = ""):
         """Add a diagnosis for a patient."""
         cursor = self.conn.cursor()
@@ -235,7 +434,8 @@ class DBManager:
             "INSERT INTO diagnosis (patient_id, ds_code, ds_descript, note) VALUES (?, ?, ?, ?)",
             (patient_id, ds_code, ds_descript, note)
         )
-        self.conn.commit()
+        self._commit()
+        self.invalidate_stats()
 
     def get_patient_by_name(self, name: str) -> Optional[Patient]:
         """Get patient by name."""
@@ -251,6 +451,12 @@ class DBManager:
         row = cursor.fetchone()
         return EDFFile(*row) if row else None
 
+    def get_ingested_hashes(self) -> FrozenSet[str]:
+        """Get hashes of all EDF files already stored in the database."""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT file_hash FROM edf_files")
+        return frozenset(row[0] for row in cursor.fetchall())
+
     def get_segments_by_edf(self, edf_id: int) -> List[Segment]:
         """Get all segments for a specific EDF file."""
         cursor = self.conn.cursor()
@@ -263,23 +469,25 @@ class DBManager:
         cursor.execute("SELECT * FROM diagnosis WHERE patient_id = ?", (patient_id,))
         return [Diagnosis(*row) for row in cursor.fetchall()]
 
+    @_cached_stats
     def get_database_stats(self) -> Dict[str, int]:
         """Get statistics about database records."""
         cursor = self.conn.cursor()
-        stats = {}
-        cursor.execute("SELECT COUNT(*) FROM patients")
-        stats['patients'] = cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM edf_files")
-        stats['edf_files'] = cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM segments")
-        stats['segments'] = cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM diagnosis")
-        stats['diagnoses'] = cursor.fetchone()[0]
-        return stats
-
-    def fill_segments_from_dict(self, seg_dict: Dict, edf_file_path: str) -> Tuple[int, int]:
-        """Fill database with segments from the segment dictionary."""
-        file_hash = self._calculate_file_hash(edf_file_path)
+        cursor.execute(
+            "SELECT (SELECT COUNT(*) FROM patients), (SELECT COUNT(*) FROM edf_files), "
+            "(SELECT COUNT(*) FROM segments), (SELECT COUNT(*) FROM diagnosis)"
+        )
+        patients, edf_files, segments, diagnoses = cursor.fetchone()
+        return {'patients': patients, 'edf_files': edf_files, 'segments': segments, 'diagnoses': diagnoses}
+
+    def fill_segments_from_dict(self, seg_dict: Dict, edf_file_path: str,
+                                file_hash: Optional[str] = None) -> Tuple[int, int]:
+        """Fill database with segments from the segment dictionary.
+
+        `file_hash` may be passed when the caller has already hashed the file.
+        """
+        if file_hash is None:
+            file_hash = self._calculate_file_hash(edf_file_path)
         if self.get_edf_file_by_hash(file_hash):
             raise ValueError("EDF file already exists in database")
         first_seg = next(iter(seg_dict.values()))
@@ -310,51 +518,68 @@ class DBManager:
                         datetime.strptime(birthdate, '%d.%m.%Y')
                 except ValueError:
                     birthdate = None
-        try:
-            patient_id = self.add_patient(name, gender, birthdate if birthdate else '01.01.1900')
-        except ValueError as e:
-            logging.error(f"Failed to add patient: {str(e)}")
-            raise
         eeg_ch = len([ch for ch in raw['ch_names'] if 'EEG' in ch])
         rate = raw['sfreq']
         start_date = raw.get('meas_date', datetime.now())
         if isinstance(start_date, (float, int)):
             start_date = datetime.fromtimestamp(start_date)
         start_date_str = start_date.strftime('%d.%m.%Y %H:%M')
-        try:
-            edf_id = self.add_edf_file(
-                patient_id=patient_id,
-                file_hash=file_hash,
-                start_date=start_date_str,
-                eeg_ch=eeg_ch,
-                rate=rate
-            )
-        except ValueError as e:
-            logging.error(f"Failed to add EDF file: {str(e)}")
-            raise
         base_dir = os.path.join(
             self.segments_dir,
             os.path.splitext(os.path.basename(edf_file_path))[0]
         )
         os.makedirs(base_dir, exist_ok=True)
-        for seg_name, seg_data in seg_dict.items():
-            clean_seg_name = "".join(c if c.isalnum() else "_" for c in seg_name)
-            seg_fname = f"seg_{clean_seg_name}_eeg.fif"
-            seg_fpath = os.path.join(base_dir, seg_fname)
+        # Different segment names can sanitize to the same file name ("Комментарий 1" and the
+        # second "Комментарий" both give "Комментарий_1"); every segment gets its own file so
+        # that no two concurrent saves write the same path.
+        seg_fpaths = []
+        used_stems = set()
+        for seg_name in seg_dict:
+            base_stem = stem = f"seg_{_NON_WORD_RE.sub('_', seg_name)}"
+            counter = 1
+            while stem in used_stems:
+                counter += 1
+                stem = f"{base_stem}_dup{counter}"
+            if stem != base_stem:
+                logging.warning(f"Segment {seg_name} collides with another segment file name, saving as {stem}")
+            used_stems.add(stem)
+            seg_fpaths.append(os.path.join(base_dir, f"{stem}_eeg.fif"))
+
+        # FIF writes are I/O bound and release the GIL, so they overlap well in threads.
+        # They run before the transaction so the write lock is not held during file I/O.
+        with ThreadPoolExecutor(max_workers=settings.MAX_WORKERS) as executor:
+            futures = [executor.submit(seg_data['data'].save, seg_fpath, overwrite=True)
+                       for seg_data, seg_fpath in zip(seg_dict.values(), seg_fpaths)]
+
+        for seg_name, future in zip(seg_dict, futures):
+            if future.exception():
+                logging.error(f"Failed to add segment {seg_name}: {str(future.exception())}")
+
+        # Patient, EDF file and segment rows are committed together
+        with self.batch_context():
             try:
-                seg_data['data'].save(seg_fpath, overwrite=True)
-                self.add_segment(
+                patient_id = self.add_patient(name, gender, birthdate if birthdate else '01.01.1900')
+            except ValueError as e:
+                logging.error(f"Failed to add patient: {str(e)}")
+                raise
+            try:
+                edf_id = self.add_edf_file(
                     patient_id=patient_id,
-                    edf_id=edf_id,
-                    seg_fpath=seg_fpath,
-                    start_time=seg_data['start_time'],
-                    end_time=seg_data['end_time'],
-                    l_marker=seg_data['current_event'],
-                    r_marker=seg_data['next_event']
+                    file_hash=file_hash,
+                    start_date=start_date_str,
+                    eeg_ch=eeg_ch,
+                    rate=rate
                 )
-            except Exception as e:
-                logging.error(f"Failed to add segment {seg_name}: {str(e)}")
-                continue
+            except ValueError as e:
+                logging.error(f"Failed to add EDF file: {str(e)}")
+                raise
+            segments = [
+                (patient_id, edf_id, seg_fpath, seg_data['start_time'], seg_data['end_time'],
+                 seg_data['current_event'], seg_data['next_event'], "")
+                for seg_data, seg_fpath, future in zip(seg_dict.values(), seg_fpaths, futures)
+                if future.exception() is None
+            ]
+            self.add_segments(segments)
 
         return patient_id, edf_id
 
@@ -408,12 +633,14 @@ class DBManager:
         cursor.execute("SELECT AVG(duration) FROM segments")
         return cursor.fetchone()[0] or 0
 
+    @_cached_stats
     def get_gender_distribution(self):
         """Get gender distribution statistics"""
         cursor = self.conn.cursor()
         cursor.execute("SELECT gender, COUNT(*) FROM patients GROUP BY gender")
         return dict(cursor.fetchall())
 
+    @_cached_stats
     def get_age_statistics(self):
         """Get age statistics (avg, min, max) calculated from birthday"""
         cursor = self.conn.cursor()
@@ -437,12 +664,12 @@ class DBManager:
             print(f"Error getting age stats: {e}")
         return None
 
+    @_cached_stats
     def get_segment_duration_stats(self):
         """Get segment duration statistics (avg, min, max) by calculating duration as end_time - start_time"""
         cursor = self.conn.cursor()
         try:
-            cursor.execute("PRAGMA table_info(segments)")
-            columns = [info[1] for info in cursor.fetchall()]
+            columns = self.get_table_columns('segments')
 
             if 'start_time' in columns and 'end_time' in columns:
                 cursor.execute("""
@@ -470,6 +697,46 @@ class DBManager:
 
         return None
 
+    @_cached_stats
+    def get_all_stats(self) -> Dict[str, Any]:
+        """Get record counts, segment duration, gender and age statistics in two queries.
+
+        Returns a dict with the results of get_database_stats ('counts'),
+        get_segment_duration_stats ('segments'), get_gender_distribution ('gender')
+        and get_age_statistics ('age').
+        """
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT c.*, s.*, a.*
+            FROM (SELECT (SELECT COUNT(*) FROM patients),
+                         (SELECT COUNT(*) FROM edf_files),
+                         (SELECT COUNT(*) FROM segments),
+                         (SELECT COUNT(*) FROM diagnosis)) AS c,
+                 (SELECT AVG(end_time - start_time),
+                         MIN(end_time - start_time),
+                         MAX(end_time - start_time)
+                  FROM segments
+                  WHERE end_time > start_time) AS s,
+                 (SELECT AVG(age), MIN(age), MAX(age)
+                  FROM (SELECT (julianday('now') - julianday(birthday, '%d.%m.%Y')) / 365.25 AS age
+                        FROM patients
+                        WHERE birthday IS NOT NULL)) AS a
+        """)
+        row = cursor.fetchone()
+        cursor.execute("SELECT gender, COUNT(*) FROM patients GROUP BY gender")
+        gender = dict(cursor.fetchall())
+
+        def as_stats(values):
+            avg, min_, max_ = values
+            return {'avg': avg, 'min': min_, 'max': max_} if avg is not None else None
+
+        return {
+            'counts': dict(zip(('patients', 'edf_files', 'segments', 'diagnoses'), row[:4])),
+            'segments': as_stats(row[4:7]),
+            'gender': gender,
+            'age': as_stats(row[7:10]),
+        }
+
     @staticmethod
     def _calculate_file_hash(file_path: str, algorithm: str = "sha256") -> str:
         """Calculate hash of a file."""
@@ -480,10 +747,12 @@ class DBManager:
         return hash_func.hexdigest()
 
     def close(self):
-        """Close database connection."""
-        if self.conn:
-            self.conn.close()
-            self.conn = None
+        """Close database connections opened by all threads."""
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+            self._local = threading.local()
 
     def __enter__(self):
         return self
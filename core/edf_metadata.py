@@ -2,10 +2,24 @@
 import mne
 import numpy as np
 from tabulate import tabulate
-from typing import Dict, Optional, Any
+from typing import Dict, Optional, Any, Sequence
 from config.settings import settings
 from core.montage_manager import MontageManager
 
+_PLAIN_TABLE_FORMATS = frozenset({'plain', 'tsv'})
+
+def fast_table(rows: Sequence[Sequence[Any]], headers: Sequence[str], fmt: Optional[str] = None) -> str:
+    """Formats a table, joining tab-separated rows directly for the plain/tsv formats instead of calling tabulate.
+
+    `fmt` defaults to settings.TABLE_FORMAT as it is at call time. Other formats, including the
+    default "pretty", still go through tabulate.
+    """
+    if fmt is None:
+        fmt = settings.TABLE_FORMAT
+    if fmt in _PLAIN_TABLE_FORMATS:
+        return '\n'.join('\t'.join(map(str, row)) for row in [headers, *rows])
+    return tabulate(rows, headers, tablefmt=fmt)
+
 class EDFMetadata:
     """Class for handling EDF file metadata extraction and processing."""
 
@@ -45,10 +59,16 @@ class EDFMetadata:
     def get_channel_info(self):
         """Returns detailed channel information with safe key access."""
         channels_info = self.raw.info['chs']
-        channel_data = []
-        for channel in channels_info:
+        locs = np.full((len(channels_info), 3), np.nan)
+        for i, channel in enumerate(channels_info):
             loc = channel.get('loc', [])
-            loc_x, loc_y, loc_z = ('-', '-', '-') if len(loc) < 3 or np.isnan(loc[:3]).any() else loc[:3]
+            if len(loc) >= 3:
+                locs[i] = loc[:3]
+        bad_locs = np.isnan(locs).any(axis=1)
+        locs = locs.astype(object)
+        locs[bad_locs] = '-'
+        channel_data = []
+        for channel, (loc_x, loc_y, loc_z) in zip(channels_info, locs.tolist()):
             channel_data.append({
                 'name': channel.get('ch_name', 'Unknown'),
                 'log_number': channel.get('logno', '-'),
@@ -71,14 +91,14 @@ class EDFMetadata:
         if self.events is None:
             return []
 
+        times = (self.events[:, 0] / self.raw.info['sfreq']).tolist()
+        codes = self.events[:, 2].tolist()
+        name_map = event_processor.get_event_name_map(self.event_id)
         event_data = []
-        for event in self.events:
-            time_index = event[0]
-            event_id_value = event[2]
-            evt_name = event_processor.get_event_name(event_id_value, self.event_id)
+        for time_seconds, event_id_value in zip(times, codes):
+            evt_name = name_map.get(event_id_value, "Unknown")
             if evt_name is None:
                 continue
-            time_seconds = time_index / self.raw.info['sfreq']
             event_data.append({
                 'time': time_seconds,
                 'event_id': event_id_value,
@@ -88,6 +108,7 @@ class EDFMetadata:
 
     def apply_montage(self):
         """Applies appropriate montage to the data."""
+        # MontageManager builds each layout once and hands out a private copy, since set_montage may modify it
         montage = MontageManager.create_montage(len(self.raw.ch_names))
         if montage:
             self.raw.set_montage(montage)
@@ -134,7 +155,7 @@ class EDFMetadata:
                 "Loc X", "Loc Y", "Loc Z"
             ]
             output_lines.append(
-                f"\nChannel Information:\n{tabulate(table_data, headers, tablefmt=settings.TABLE_FORMAT)}\n")
+                f"\nChannel Information:\n{fast_table(table_data, headers)}\n")
         except Exception as e:
             output_lines.append(f"\nWarning: Could not get full channel information: {str(e)}\n")
         event_data = self.get_event_info(event_processor)
@@ -146,5 +167,5 @@ class EDFMetadata:
             ] for evt in event_data]
             headers = ["Time (sec)", "Event ID", "Description"]
             output_lines.append(f"\nNumber of events: {len(self.events)}\nEvent List:\n")
-            output_lines.append(tabulate(table_data, headers, tablefmt=settings.TABLE_FORMAT))
+            output_lines.append(fast_table(table_data, headers))
         return ''.join(output_lines)
\ No newline at end of file
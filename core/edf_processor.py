@@ -1,30 +1,43 @@
 # core/edf_processor.py
 import os
+import re
 import hashlib
 import random
 import csv
+import multiprocessing
 from collections import defaultdict
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone
 from dateutil.parser import parse
 from tqdm import tqdm
 from mne.io import read_raw_edf
 from mne import find_events
-from pandas import DataFrame
+from pandas import DataFrame, Series
 import logging
 from transliterate import translit
 
 from config.settings import settings
+from core import hash_cache
 from core.edf_visualizer import EDFVisualizer
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
+EDF_HEADER_SIZE = 256
+# EDF+ recording identification: "Startdate dd-MMM-yyyy ..."
+_EDF_PLUS_STARTDATE_RE = re.compile(r"^Startdate\s+\d{1,2}-[A-Za-z]{3}-(\d{4})\b")
+_DIGITS_RE = re.compile(r"\d+")
+
 class EDFProcessor:
+    # Below this many files a process pool costs more to spawn than it saves
+    PROCESS_POOL_MIN_FILES = 32
+
     def __init__(self, directory_path):
         self.directory = directory_path
         self.output_dir = os.path.join(self.directory, "output")
         os.makedirs(self.output_dir, exist_ok=True)
         self.visualizer = EDFVisualizer(self.output_dir)
+        # path -> (size, mtime_ns, metadata) from the last analyze_directory run
+        self._metadata_cache = {}
 
     def check_directory(self):
         """Check if the directory exists."""
@@ -38,13 +51,15 @@ class EDFProcessor:
         try:
             raw = read_raw_edf(file_path, preload=False)
             info = raw.info
+            sfreq = info['sfreq']
             subject_info = info.get('subject_info', {})
             metadata = {
                 'file_name': os.path.basename(file_path),
                 'subject_info': subject_info,
-                'duration': raw.times[-1],
+                # Same value as raw.times[-1] without materializing the full time axis
+                'duration': (raw.n_times - 1) / sfreq,
                 'channels': info['ch_names'],
-                'sfreq': info['sfreq'],
+                'sfreq': sfreq,
                 'meas_date': info.get('meas_date', None)
             }
             if detailed:
@@ -108,18 +123,37 @@ class EDFProcessor:
         return renamed_count
 
     def analyze_directory(self):
-        """Analyze all EDF files in the specified directory."""
-        metadata_list = []
-        files = [os.path.join(self.directory, f) for f in os.listdir(self.directory) if f.endswith('.edf')]
+        """Analyze all EDF files in the specified directory.
 
-        with ThreadPoolExecutor(max_workers=settings.MAX_WORKERS) as executor:
-            futures = {executor.submit(self.get_edf_metadata, file): file for file in files}
+        Headers of files whose size and mtime are unchanged since the previous run are not read again.
+        """
+        metadata_list = []
+        files = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith('.edf'):
+                continue
+            st = entry.stat()
+            cached = self._metadata_cache.get(entry.path)
+            if cached and cached[:2] == (st.st_size, st.st_mtime_ns):
+                metadata_list.append(cached[2])
+            else:
+                files.append((entry.path, st.st_size, st.st_mtime_ns))
+
+        # Разбор заголовков идёт в Python-коде mne, поэтому для больших каталогов процессы обходят GIL
+        if len(files) >= self.PROCESS_POOL_MIN_FILES:
+            # spawn, not fork: this process already runs Tk and worker threads whose locks a fork would copy
+            executor = ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=multiprocessing.get_context("spawn"))
+        else:
+            executor = ThreadPoolExecutor(max_workers=settings.MAX_WORKERS)
+        with executor:
+            futures = {executor.submit(EDFProcessor.get_edf_metadata, file[0]): file for file in files}
             for future in tqdm(as_completed(futures), total=len(futures), desc="Analyzing files", unit="file"):
-                file = futures[future]
+                file, size, mtime_ns = futures[future]
                 try:
                     metadata = future.result()
                     if metadata:
                         metadata_list.append(metadata)
+                        self._metadata_cache[file] = (size, mtime_ns, metadata)
                 except Exception as e:
                     logging.error(f"Error analyzing file {file}: {e}")
                     continue  # Продолжаем обработку остальных файлов
@@ -159,13 +193,29 @@ class EDFProcessor:
 
     @staticmethod
     def get_edf_start_time(file_path):
-        """Extract the recording start time from an EDF file."""
+        """Extract the recording start time (UTC) from the fixed-size 256-byte EDF header.
+
+        The rules mirror how mne derives meas_date: the day and month come from startdate
+        (bytes 168-176); the four-digit year of an EDF+ "Startdate dd-MMM-yyyy" recording id
+        (bytes 88-168) is preferred over the two-digit one, which otherwise follows the EDF
+        clipping rule (85-99 -> 19xx, else 20xx); a starttime (bytes 176-184) that does not
+        parse is taken as 00:00:00. Returns None if the date itself cannot be read.
+        """
         try:
-            raw = read_raw_edf(file_path, verbose=False)
-            start_datetime = raw.info['meas_date']
-            if start_datetime:
-                return start_datetime
-            return None
+            with open(file_path, "rb") as f:
+                header = f.read(EDF_HEADER_SIZE)
+            if len(header) < EDF_HEADER_SIZE:
+                raise ValueError("truncated EDF header")
+            day, month, year = (int(part) for part in _DIGITS_RE.findall(header[168:176].decode("latin-1")))
+            year += 1900 if year >= 85 else 2000
+            startdate = _EDF_PLUS_STARTDATE_RE.match(header[88:168].decode("latin-1").strip())
+            if startdate:
+                year = int(startdate.group(1))
+            try:
+                hour, minute, second = (int(part) for part in _DIGITS_RE.findall(header[176:184].decode("latin-1")))
+            except ValueError:
+                hour = minute = second = 0
+            return datetime(year, month, day, hour, minute, second, tzinfo=timezone.utc)
         except Exception as e:
             logging.error(f"Error reading file {file_path}: {e}")
             return None
@@ -200,19 +250,32 @@ class EDFProcessor:
         return similar_time_groups
 
     @staticmethod
-    def calculate_file_hash(file_path, hash_algorithm="md5", chunk_size=8192):
+    def calculate_file_hash(file_path, hash_algorithm="blake2b", chunk_size=1 << 20):
         """Calculate the file hash for content verification."""
-        hash_func = hashlib.new(hash_algorithm)
-        with open(file_path, "rb") as f:
+        if hash_algorithm == "blake2b":
+            hash_func = hashlib.blake2b(digest_size=16)
+        else:
+            hash_func = hashlib.new(hash_algorithm)
+        with open(file_path, "rb", buffering=0) as f:
             while chunk := f.read(chunk_size):
                 hash_func.update(chunk)
         return hash_func.hexdigest()
 
+    def _try_hash_file(self, file_path):
+        """Hash a file through the directory hash cache, logging and returning None if it cannot be read."""
+        try:
+            return hash_cache.get_or_compute(self.directory, file_path, self.calculate_file_hash, "blake2b")
+        except OSError as e:
+            logging.warning(f"Could not hash {file_path}: {e}")
+            return None
+
     def find_duplicate_files(self):
         """Find duplicate files in the specified directory."""
         file_paths = []
         for root, _, files in os.walk(self.directory):
             for file in files:
+                if file.startswith(hash_cache.CACHE_FILE_NAME):
+                    continue
                 file_path = os.path.join(root, file)
                 file_paths.append(file_path)
         size_dict = defaultdict(list)
@@ -222,19 +285,16 @@ class EDFProcessor:
                 size_dict[size].append(path)
             except OSError as e:
                 logging.warning(f"Could not get size for {path}: {e}")
+        # Хешируются только файлы с одинаковым размером; hashlib отпускает GIL, поэтому потоки читают параллельно
+        candidates = [path for paths in size_dict.values() if len(paths) > 1 for path in paths]
         hash_dict = defaultdict(list)
-        with tqdm(total=sum(len(paths) for paths in size_dict.values() if len(paths) > 1),
-                  desc="Checking duplicates", unit="file") as pbar:
-            for size, paths in size_dict.items():
-                if len(paths) > 1:  # Только файлы с одинаковым размером
-                    for path in paths:
-                        try:
-                            file_hash = self.calculate_file_hash(path)
-                            hash_dict[file_hash].append(path)
-                            pbar.update(1)
-                        except OSError as e:
-                            logging.warning(f"Could not hash {path}: {e}")
-                            pbar.update(1)
+        with ThreadPoolExecutor(max_workers=settings.IO_WORKERS) as executor:
+            # map сохраняет порядок файлов, поэтому в каждой группе первым остаётся тот же файл, что и раньше
+            hashes = executor.map(self._try_hash_file, candidates)
+            for path, file_hash in zip(candidates, tqdm(hashes, total=len(candidates),
+                                                        desc="Checking duplicates", unit="file")):
+                if file_hash is not None:
+                    hash_dict[file_hash].append(path)
         duplicates = {hash_val: paths for hash_val, paths in hash_dict.items() if len(paths) > 1}
         total_duplicates = sum(len(paths) - 1 for paths in duplicates.values())
         logging.info(f"Found {len(duplicates)} duplicate groups ({total_duplicates} redundant files)")
@@ -285,23 +345,22 @@ class EDFProcessor:
 
     def generate_statistics(self, metadata_list):
         """Generate descriptive statistics from metadata and save results."""
-        stats = defaultdict(list)
-        for metadata in metadata_list:
-            subject_info = metadata.get('subject_info', {})
-            stats['file_name'].append(metadata['file_name'])
-            stats['sex'].append(
-                'Male' if subject_info.get('sex') == 1 else 'Female' if subject_info.get('sex') == 2 else 'Unknown')
-
-            birthdate = subject_info.get('birthday')
-            recording_date = metadata.get('meas_date')
-            if birthdate and recording_date:
-                age = self.calculate_age(birthdate, recording_date)
-                if age is not None:
-                    stats['age'].append(min(age, 60))  # Limit age to 60 years
-
-            stats['duration_minutes'].append(metadata['duration'] / 60)
-
-        df = DataFrame(stats)
+        subject_infos = [metadata.get('subject_info') or {} for metadata in metadata_list]
+        ages = [
+            self.calculate_age(info.get('birthday'), metadata.get('meas_date'))
+            if info.get('birthday') and metadata.get('meas_date') else None
+            for info, metadata in zip(subject_infos, metadata_list)
+        ]
+        # Columns are built whole so that files without an age keep their row (NaN) instead of misaligning the table
+        df = DataFrame({
+            'file_name': [metadata['file_name'] for metadata in metadata_list],
+            'sex': Series([info.get('sex') for info in subject_infos], dtype=object)
+                .map({1: 'Male', 2: 'Female'}).fillna('Unknown'),
+            'duration_minutes': Series([metadata['duration'] for metadata in metadata_list], dtype=float) / 60,
+        })
+        ages = Series(ages, dtype=float)
+        if ages.notna().any():
+            df['age'] = ages.clip(upper=60)  # Limit age to 60 years
         descriptive_stats = {
             'sex_distribution': df['sex'].value_counts(),
             'age_distribution': df['age'].describe() if 'age' in df.columns else None,
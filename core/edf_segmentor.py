@@ -1,15 +1,59 @@
 # core/edf_segmentor.py
+import os
 import time
 import tkinter as tk
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from threading import Lock
-from typing import Any, Dict, List, Optional, Set, Tuple, Union
-from tabulate import tabulate
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Any, Dict, List, Optional, Tuple, Union
 import mne
+import numpy as np
 from config.settings import settings
-from core.edf_metadata import EDFMetadata
+from core.edf_metadata import EDFMetadata, fast_table
 from core.event_processor import EventProcessor
 
+@dataclass
+class SegmentTable:
+	"""Segments of a recording stored column-wise, one list or array per field."""
+	names: List[str] = field(default_factory=list)
+	start_times: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.float64))
+	end_times: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.float64))
+	current_events: List[str] = field(default_factory=list)
+	next_events: List[str] = field(default_factory=list)
+	data: List[mne.io.BaseRaw] = field(default_factory=list)
+
+	def __len__(self) -> int:
+		return len(self.names)
+
+	@cached_property
+	def as_dict(self) -> Dict[str, Dict[str, Any]]:
+		"""Row-wise {name: {'start_time', 'end_time', 'current_event', 'next_event', 'data'}} view."""
+		return {
+			name: {
+				'start_time': start_time,
+				'end_time': end_time,
+				'current_event': current_event,
+				'next_event': next_event,
+				'data': data
+			}
+			for name, start_time, end_time, current_event, next_event, data in zip(
+				self.names, self.start_times.tolist(), self.end_times.tolist(),
+				self.current_events, self.next_events, self.data
+			)
+		}
+
+def _build_segments(samples: np.ndarray, last_sample: int, sfreq: float,
+					min_duration: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+	"""Returns start samples, end samples and marker indices of the segments between markers.
+
+	Segment i runs from marker i to marker i + 1 (the last one to `last_sample`) and is
+	kept when it lasts at least `min_duration` seconds. The duration is compared in seconds,
+	as end / sfreq - start / sfreq, so that a segment of exactly `min_duration` is kept.
+	"""
+	ends = np.append(samples[1:], np.int64(last_sample))
+	keep = np.flatnonzero(ends / sfreq - samples / sfreq >= min_duration)
+	return samples[keep], ends[keep], keep
+
 class EDFSegmentor:
 	"""Class for processing EDF files, including loading metadata and splitting into segments."""
 
@@ -18,28 +62,66 @@ class EDFSegmentor:
 	UNKNOWN_SEGMENT_NAME = "Unknown"
 
 	def __init__(self, output_widget: tk.Text):
-		self.seg_dict: Dict[str, Dict[str, Any]] = {}
+		self.segments: SegmentTable = SegmentTable()
 		self.output_widget: tk.Text = output_widget
 		self.metadata: Optional[EDFMetadata] = None
 		self.current_file_path: Optional[str] = None
-		self.lock: Lock = Lock()
+		self._name_counters: Dict[str, int] = {}
+		self._metadata_mtime: Optional[float] = None
+		self._metadata_output: Optional[str] = None
 		self.processing_start_time: float = 0
 
-	def load_metadata(self, file_path: str) -> None:
-		"""Loads metadata from an EDF file with improved error handling."""
+	def reset(self) -> None:
+		"""Drops per-file state so the instance can be reused for the next recording."""
+		if self.metadata is not None and self.metadata.raw is not None:
+			self.metadata.raw.close()
+		self.segments = SegmentTable()
+		self.metadata = None
+		self.current_file_path = None
+		self._name_counters.clear()
+		self._metadata_mtime = None
+		self._metadata_output = None
+
+	@property
+	def seg_dict(self) -> Dict[str, Dict[str, Any]]:
+		"""Segments as a {name: fields} mapping, as consumed by DBManager.fill_segments_from_dict."""
+		return self.segments.as_dict
+
+	def load_metadata(self, file_path: str) -> bool:
+		"""Loads metadata from an EDF file with improved error handling.
+
+		Returns True when the file is unchanged since the previous call and the loaded
+		metadata and segments were kept.
+		"""
 		self.current_file_path = file_path
 		try:
 			self.output_widget.delete(1.0, tk.END)
+			mtime = os.path.getmtime(file_path)
+			# Тот же файл без изменений: повторно выводим уже подготовленные метаданные
+			if (self.metadata is not None and self._metadata_output is not None
+					and self.metadata.file_path == file_path and self._metadata_mtime == mtime):
+				self.output_widget.insert(tk.END, self._metadata_output)
+				return True
+
+			# Другой или изменённый файл: сегменты прежней записи больше не действительны
+			if self.metadata is not None and self.metadata.raw is not None:
+				self.metadata.raw.close()
+			self.segments = SegmentTable()
+			self._name_counters.clear()
+			self._metadata_output = None
 			self.metadata = EDFMetadata(file_path)
+			self._metadata_mtime = mtime
 
 			if not isinstance(self.metadata.raw, mne.io.BaseRaw):
 				raise TypeError("Invalid raw data format")
 
 			try:
-				self.output_widget.insert(tk.END, self.metadata.format_metadata_output(EventProcessor))
+				self._metadata_output = self.metadata.format_metadata_output(EventProcessor)
+				self.output_widget.insert(tk.END, self._metadata_output)
 			except Exception as format_error:
 				self.output_widget.insert(tk.END, f"Warning: Metadata formatting issue: {str(format_error)}\n")
 			# Still proceed even if formatting had issues
+			return False
 
 		except Exception as e:
 			error_msg = f"Error: Failed to load metadata: {str(e)}\n"
@@ -55,113 +137,77 @@ class EDFSegmentor:
 			self.output_widget.insert(tk.END, "Error: Please select an EDF file for processing first.\n")
 			raise Exception("Please select an EDF file for processing first.")
 
-		self.output_widget.insert(tk.END, "Starting processing with excluded markers...\n")
+		# Вывод накапливается в буфере и вставляется в виджет одним вызовом
+		out: List[str] = ["Starting processing with excluded markers...\n"]
 
 		# Фильтрация событий: оставляем только те, которые НЕ в EXCLUDED_NAMES
-		valid_events = []
-		for event in self.metadata.events:
-			evt_code = event[2]
-			evt_name = EventProcessor.get_event_name(evt_code, self.metadata.event_id)
-			if evt_name is not None:  # None означает, что маркер в EXCLUDED_NAMES
-				valid_events.append(event)
-
-		if not valid_events:
-			self.output_widget.insert(tk.END, "No valid events found after filtering.\n")
+		# (None в карте имён означает, что маркер в EXCLUDED_NAMES)
+		events = np.asarray(self.metadata.events)
+		name_map = EventProcessor.get_event_name_map(self.metadata.event_id)
+		event_names = [name_map.get(code, self.UNKNOWN_SEGMENT_NAME) for code in events[:, 2].tolist()]
+		valid_mask = np.fromiter((name is not None for name in event_names), dtype=bool, count=len(event_names))
+		valid_events = events[valid_mask]
+		names: List[str] = [name for name in event_names if name is not None]
+
+		if not len(valid_events):
+			out.append("No valid events found after filtering.\n")
+			self.output_widget.insert(tk.END, ''.join(out))
 			return
 
 		# Обработка сегментов между валидными маркерами
-		self.seg_dict.clear()
-		existing_names: Set[str] = set()
+		self._name_counters.clear()
 
-		# Первый сегмент (от начала до первого валидного маркера)
-		first_event_time = float(valid_events[0][0]) / self.metadata.raw.info['sfreq']
-		if first_event_time > settings.MIN_SEGMENT_DURATION:
-			seg_name = EventProcessor.generate_segment_name(
-				self.START_SEGMENT_NAME, existing_names
-			)
-			seg_data = self.metadata.raw.copy().crop(tmin=0, tmax=first_event_time)
-			self.seg_dict[seg_name] = {
-				'start_time': 0,
-				'end_time': first_event_time,
-				'current_event': self.START_SEGMENT_NAME,
-				'next_event': EventProcessor.get_event_name(
-					valid_events[0][2], self.metadata.event_id
-				),
-				'data': seg_data
-			}
-			existing_names.add(seg_name)
-
-		# Основные сегменты (между валидными маркерами)
-		for i in range(len(valid_events)):
-			start_idx = valid_events[i]
-			end_idx = valid_events[i + 1] if i + 1 < len(valid_events) else None
-
-			start_time = float(start_idx[0]) / self.metadata.raw.info['sfreq']
-			end_time = (
-				float(end_idx[0]) / self.metadata.raw.info['sfreq']
-				if end_idx is not None
-				else self.metadata.raw.times[-1]
-			)
+		sfreq = float(self.metadata.raw.info['sfreq'])
+		# Границы сегментов считаются в отсчётах (int64): конец i-го сегмента — начало (i+1)-го,
+		# для последнего — последний отсчёт записи. В секунды переводятся только итоговые границы
+		samples = valid_events[:, 0].astype(np.int64)
 
-			if end_time - start_time < settings.MIN_SEGMENT_DURATION:
-				continue
+		# Основные сегменты (между валидными маркерами) отбираются одной векторной операцией
+		start_samples, end_samples, idx = _build_segments(
+			samples, self.metadata.raw.n_times - 1, sfreq, settings.MIN_SEGMENT_DURATION)
+		last = len(names) - 1
+		current_events: List[str] = [names[i] for i in idx.tolist()]
+		next_events: List[str] = [self.END_SEGMENT_NAME if i == last else names[i + 1] for i in idx.tolist()]
 
-			evt_name = EventProcessor.get_event_name(
-				start_idx[2], self.metadata.event_id
-			)
-			next_evt = (
-				self.END_SEGMENT_NAME
-				if end_idx is None
-				else EventProcessor.get_event_name(end_idx[2], self.metadata.event_id)
-			)
+		# Первый сегмент (от начала до первого валидного маркера)
+		first_sample = samples[0]
+		if first_sample / sfreq > settings.MIN_SEGMENT_DURATION:
+			start_samples = np.concatenate(([0], start_samples))
+			end_samples = np.concatenate(([first_sample], end_samples))
+			current_events.insert(0, self.START_SEGMENT_NAME)
+			next_events.insert(0, names[0])
+
+		start_times = start_samples / sfreq
+		end_times = end_samples / sfreq
+
+		seg_names = [EventProcessor.generate_segment_name(evt, self._name_counters) for evt in current_events]
+		# Обрезка выполняется параллельно, имена присвоены последовательно в исходном порядке
+		with ThreadPoolExecutor(max_workers=settings.MAX_WORKERS) as executor:
+			data = list(executor.map(self._crop_segment, start_times.tolist(), end_times.tolist()))
+		self.segments = SegmentTable(
+			names=seg_names,
+			start_times=start_times,
+			end_times=end_times,
+			current_events=current_events,
+			next_events=next_events,
+			data=data
+		)
 
-			seg_name = EventProcessor.generate_segment_name(evt_name, existing_names)
-			seg_data = self.metadata.raw.copy().crop(tmin=start_time, tmax=end_time)
+		self._output_results(out)
+		processing_time = time.time() - self.processing_start_time
+		out.append(f"\nProcessing completed in {processing_time:.2f} seconds\n")
+		self.output_widget.insert(tk.END, ''.join(out))
 
-			self.seg_dict[seg_name] = {
-				'start_time': start_time,
-				'end_time': end_time,
-				'current_event': evt_name,
-				'next_event': next_evt,
-				'data': seg_data
-			}
-			existing_names.add(seg_name)
+	def _crop_segment(self, tmin: float, tmax: float) -> mne.io.BaseRaw:
+		"""Returns a lazily cropped segment of the recording.
 
-		self._output_results()
-		processing_time = time.time() - self.processing_start_time
-		self.output_widget.insert(tk.END, f"\nProcessing completed in {processing_time:.2f} seconds\n")
-
-	def _process_segment(self, s_idx: int, e_idx: Optional[int]) -> Optional[Tuple[str, Dict[str, Any]]]:
-		"""Processes a segment and returns the segment name and data."""
-		s_t: float = float(self.metadata.events[s_idx, 0]) / float(self.metadata.raw.info['sfreq'])
-		e_t: float = (float(self.metadata.events[e_idx, 0]) / float(self.metadata.raw.info['sfreq'])
-					  if e_idx is not None else float(self.metadata.raw.times[-1]))
-
-		if e_t - s_t < settings.MIN_SEGMENT_DURATION:
-			return None
-
-		evt_code: int = int(self.metadata.events[s_idx, 2])
-		evt_name = EventProcessor.get_event_name(evt_code, self.metadata.event_id)
-		next_evt = self.END_SEGMENT_NAME if e_idx is None else EventProcessor.get_event_name(
-			int(self.metadata.events[e_idx, 2]),
-			self.metadata.event_id
-		)
+		The raw file is opened with preload=False, so the copy only duplicates the
+		header structures and the segment's samples are read from disk when it is saved.
+		"""
+		return self.metadata.raw.copy().crop(tmin=tmin, tmax=tmax)
 
-		with self.lock:
-			existing_names: Set[str] = set(self.seg_dict.keys())
-			seg_name = EventProcessor.generate_segment_name(evt_name, existing_names)
-
-		seg_data = self.metadata.raw.copy().crop(tmin=s_t, tmax=e_t)
-		return (seg_name, {
-			'start_time': s_t,
-			'end_time': e_t,
-			'current_event': evt_name,
-			'next_event': next_evt,
-			'data': seg_data
-		})
-
-	def _output_results(self) -> None:
-		"""Outputs the processing results to the text widget."""
+	def _output_results(self, out: List[str]) -> None:
+		"""Appends the processing results to the output buffer."""
 		structure_data = [
 			["Key", "Key", "Type", "Example Value"],
 			["*seg_name*", "", "", ""],
@@ -172,27 +218,26 @@ class EDFSegmentor:
 			["", "next_event", "str", "OG"],
 			["", "data", "RawEDF", "RawEDF Object"]
 		]
-		self.output_widget.insert(tk.END, "Segment Dictionary Structure:\n")
-		self.output_widget.insert(tk.END,
-								  tabulate(structure_data, headers="firstrow", tablefmt=settings.TABLE_FORMAT) + "\n\n")
-
-		table_data: List[List[Union[str, float]]] = []
-		valid_segments_count = 0
-		for seg_name, t in self.seg_dict.items():
-			duration = t['end_time'] - t['start_time']
-			if duration >= settings.MIN_SEGMENT_DURATION:
-				table_data.append([
-					seg_name,
-					f"{t['start_time']:.3f}",
-					f"{t['end_time']:.3f}",
-					t['current_event'],
-					t['next_event'],
-					float(f"{duration:.3f}")
-				])
-				valid_segments_count += 1
+		out.append("Segment Dictionary Structure:\n")
+		out.append(fast_table(structure_data[1:], structure_data[0]) + "\n\n")
+
+		segs = self.segments
+		durations = segs.end_times - segs.start_times
+		valid = np.flatnonzero(durations >= settings.MIN_SEGMENT_DURATION).tolist()
+		table_data: List[List[Union[str, float]]] = [
+			[
+				segs.names[i],
+				f"{segs.start_times[i]:.3f}",
+				f"{segs.end_times[i]:.3f}",
+				segs.current_events[i],
+				segs.next_events[i],
+				float(f"{durations[i]:.3f}")
+			]
+			for i in valid
+		]
+		valid_segments_count = len(valid)
 
 		headers: List[str] = ["Segment", "Start", "End", "From", "To", "Duration"]
-		self.output_widget.insert(tk.END,
-								  f"Number of segments with duration >= {settings.MIN_SEGMENT_DURATION} sec: {valid_segments_count}\n")
-		self.output_widget.insert(tk.END, "Segment Data:\n")
-		self.output_widget.insert(tk.END, tabulate(table_data, headers, tablefmt=settings.TABLE_FORMAT) + "\n")
\ No newline at end of file
+		out.append(f"Number of segments with duration >= {settings.MIN_SEGMENT_DURATION} sec: {valid_segments_count}\n")
+		out.append("Segment Data:\n")
+		out.append(fast_table(table_data, headers) + "\n")
\ No newline at end of file
@@ -1,13 +1,22 @@
 # core/edf_visualizer.py
 import os
+import matplotlib
+matplotlib.use('Agg')
+import pandas as pd
 from seaborn import countplot, histplot
 import matplotlib.pyplot as plt
 
 class EDFVisualizer:
     def __init__(self, output_dir):
-        """ Initialize the visualizer with the output directory. """
+        """ Initialize the visualizer with the output directory and a reusable figure. """
         self.output_dir = os.path.normpath(output_dir)
         os.makedirs(self.output_dir, exist_ok=True)
+        self._fig, self._ax = plt.subplots(figsize=(8, 6))
+
+    def __del__(self):
+        fig = getattr(self, '_fig', None)
+        if fig is not None:
+            plt.close(fig)
 
     def visualize_statistics(self, df):
         """ Visualize statistics and save plots to the output directory. """
@@ -15,37 +24,33 @@ class EDFVisualizer:
         self._visualize_age_distribution(df)
         self._visualize_duration_distribution(df)
 
+    def _save_plot(self, title, file_name):
+        """ Title the shared axes and save the figure to the output directory. """
+        self._ax.set_title(title)
+        save_path = os.path.normpath(os.path.join(self.output_dir, file_name))
+        self._fig.savefig(save_path)
+        print(f"Сохранено: {save_path}")
+
     def _visualize_sex_distribution(self, df):
         """ Visualize and save the sex distribution plot. """
         if 'sex' in df.columns:
-            fig = plt.figure(figsize=(8, 6))
-            countplot(data=df, x='sex')
-            plt.title('Sex Distribution')
-            save_path = os.path.normpath(os.path.join(self.output_dir, 'sex_distribution.png'))
-            plt.savefig(save_path)
-            plt.close(fig)
-            print(f"Сохранено: {save_path}")
+            self._ax.clear()
+            countplot(data=df, x='sex', ax=self._ax)
+            self._save_plot('Sex Distribution', 'sex_distribution.png')
 
     def _visualize_age_distribution(self, df):
         """ Visualize and save the age distribution plot. """
         if 'age' in df.columns:
-            age_data = df[df['age'].apply(lambda x: isinstance(x, (int, float)))]
+            ages = pd.to_numeric(df['age'], errors='coerce')
+            age_data = df.loc[ages.notna()].assign(age=ages.dropna())
             if not age_data.empty:
-                fig = plt.figure(figsize=(8, 6))
-                histplot(data=age_data, x='age', bins=20, kde=True)
-                plt.title('Age Distribution')
-                save_path = os.path.normpath(os.path.join(self.output_dir, 'age_distribution.png'))
-                plt.savefig(save_path)
-                plt.close(fig)
-                print(f"Сохранено: {save_path}")
+                self._ax.clear()
+                histplot(data=age_data, x='age', bins=20, kde=True, ax=self._ax)
+                self._save_plot('Age Distribution', 'age_distribution.png')
 
     def _visualize_duration_distribution(self, df):
         """ Visualize and save the recording duration distribution plot. """
         if 'duration_minutes' in df.columns:
-            fig = plt.figure(figsize=(8, 6))
-            histplot(data=df, x='duration_minutes', bins=20, kde=True)
-            plt.title('Recording Duration (minutes)')
-            save_path = os.path.normpath(os.path.join(self.output_dir, 'duration_distribution.png'))
-            plt.savefig(save_path)
-            plt.close(fig)
-            print(f"Сохранено: {save_path}")
\ No newline at end of file
+            self._ax.clear()
+            histplot(data=df, x='duration_minutes', bins=20, kde=True, ax=self._ax)
+            self._save_plot('Recording Duration (minutes)', 'duration_distribution.png')
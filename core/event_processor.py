@@ -1,8 +1,13 @@
 # core/event_processor.py
+import functools
 import re
-from typing import Dict, Optional, Set
+from typing import Dict, FrozenSet, Optional, Set, Tuple
 from typing_extensions import Final
 
+_BRACKETS_RE = re.compile(r'\[.*?\]|\(.*?\)')
+_FREQ_RE = re.compile(r'(\d+)\s*Гц')
+_TONE_RE = re.compile(r'Тон\s*(\d+)\s*Гц')
+
 class EventProcessor:
 	"""Handler for generating event names and processing events."""
 
@@ -28,11 +33,15 @@ class EventProcessor:
 	}
 
 	@classmethod
+	@functools.lru_cache(maxsize=512)
 	def _clean_event_name(cls, name: str) -> Optional[str]:
 		"""Cleans event name: removes brackets/parentheses, checks excluded names, translates to English."""
-		cleaned_name = re.sub(r'\[.*?\]|\(.*?\)', '', name).strip()
+		if name in cls.EXCLUDED_NAMES:
+			return None
 
-		if cleaned_name in cls.EXCLUDED_NAMES or name in cls.EXCLUDED_NAMES:
+		cleaned_name = _BRACKETS_RE.sub('', name).strip()
+
+		if cleaned_name in cls.EXCLUDED_NAMES:
 			return None
 
 		if not cleaned_name:
@@ -41,8 +50,8 @@ class EventProcessor:
 		for ru_name, en_name in cls.TRANSLATIONS.items():
 			if ru_name in cleaned_name:
 				if "Photic" in en_name or "Auditory" in en_name:
-					freq_match = re.search(r'(\d+)\s*Гц', name)
-					tone_match = re.search(r'Тон\s*(\d+)\s*Гц', name)
+					freq_match = _FREQ_RE.search(name)
+					tone_match = _TONE_RE.search(name)
 					if tone_match:
 						return f"{en_name}{tone_match.group(1)}Hz"
 					elif freq_match:
@@ -52,18 +61,30 @@ class EventProcessor:
 		return cleaned_name
 
 	@classmethod
-	def get_event_name(cls, evt_code: int, ev_id: Dict[str, int]) -> Optional[str]:
-		"""Returns the event name based on its code."""
-		name = next((name for name, code in ev_id.items() if code == evt_code), "Unknown")
-		return cls._clean_event_name(name)
+	def get_event_name_map(cls, ev_id: Dict[str, int]) -> Dict[int, Optional[str]]:
+		"""Returns a mapping from event code to cleaned event name (None for excluded markers)."""
+		return cls._build_event_name_map(frozenset(ev_id.items()))
+
+	@classmethod
+	@functools.lru_cache(maxsize=32)
+	def _build_event_name_map(cls, ev_items: FrozenSet[Tuple[str, int]]) -> Dict[int, Optional[str]]:
+		"""Builds the code to name mapping for a frozen set of event_id items."""
+		return {code: cls._clean_event_name(name) for name, code in ev_items}
 
 	@classmethod
-	def generate_segment_name(cls, base_name: Optional[str], existing_names: Set[str]) -> str:
-		"""Generates a unique name for a segment."""
+	def generate_segment_name(cls, base_name: Optional[str], counters: Dict[str, int]) -> str:
+		"""Generates a unique name for a segment.
+
+		`counters` maps every name issued so far to the next numeric suffix to try for it,
+		so repeated base names get `base`, `base_1`, `base_2`, ... in amortized O(1).
+		"""
 		base = base_name if base_name is not None else "Unknown"
-		seg_name = base
-		counter = 1
-		while seg_name in existing_names:
-			seg_name = f"{base}_{counter}"
+		counter = counters.get(base, 0)
+		seg_name = base if counter == 0 else f"{base}_{counter}"
+		# A suffixed name may already have been issued for a marker literally called so
+		while counter and seg_name in counters:
 			counter += 1
+			seg_name = f"{base}_{counter}"
+		counters[base] = counter + 1
+		counters.setdefault(seg_name, 1)
 		return seg_name
\ No newline at end of file
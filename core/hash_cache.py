@@ -0,0 +1,87 @@
+# core/hash_cache.py
+import json
+import logging
+import os
+import tempfile
+import threading
+from typing import Any, Callable, Dict
+
+CACHE_FILE_NAME = ".edf_hashes.json"
+
+_lock = threading.Lock()
+_caches: Dict[str, Dict[str, Dict[str, Any]]] = {}
+_dirty = set()
+
+def _cache_path(directory: str) -> str:
+    return os.path.join(directory, CACHE_FILE_NAME)
+
+def load(directory: str) -> Dict[str, Dict[str, Any]]:
+    """Load the persisted hash cache of a directory, returning an empty one if it is missing or unreadable.
+
+    Entries map a path relative to `directory` to {"size", "mtime_ns", "hashes": {algorithm: hash}}.
+    """
+    try:
+        with open(_cache_path(directory), "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    return {path: entry for path, entry in data.items()
+            if isinstance(entry, dict) and isinstance(entry.get("hashes"), dict)}
+
+def save(directory: str, cache: Dict[str, Dict[str, Any]]) -> None:
+    """Write the hash cache of a directory atomically through a uniquely named temporary file."""
+    _write(directory, json.dumps(cache))
+
+def _write(directory: str, payload: str) -> None:
+    with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=directory, prefix=CACHE_FILE_NAME + ".",
+                                     suffix=".tmp", delete=False) as f:
+        f.write(payload)
+    try:
+        os.replace(f.name, _cache_path(directory))
+    except OSError:
+        os.unlink(f.name)
+        raise
+
+def get_or_compute(directory: str, path: str, compute: Callable[[str], str], algorithm: str) -> str:
+    """Return the hash of `path`, computing it with `compute` only if the file changed since it was cached.
+
+    Each file has one entry keyed by its path relative to `directory`; a change in size or mtime_ns
+    replaces the entry, dropping hashes of the old content.
+    """
+    st = os.stat(path)
+    key = os.path.relpath(path, directory)
+    with _lock:
+        cache = _caches.get(directory)
+        if cache is None:
+            cache = _caches[directory] = load(directory)
+        entry = cache.get(key)
+        if entry and entry.get("size") == st.st_size and entry.get("mtime_ns") == st.st_mtime_ns:
+            file_hash = entry["hashes"].get(algorithm)
+            if file_hash is not None:
+                return file_hash
+    file_hash = compute(path)
+    with _lock:
+        entry = cache.get(key)
+        if not entry or entry.get("size") != st.st_size or entry.get("mtime_ns") != st.st_mtime_ns:
+            entry = cache[key] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "hashes": {}}
+        entry["hashes"][algorithm] = file_hash
+        _dirty.add(directory)
+    return file_hash
+
+def flush() -> None:
+    """Persist every cache that gained entries since the last flush, dropping entries of deleted files."""
+    with _lock:
+        pending = list(_dirty)
+        _dirty.clear()
+    for directory in pending:
+        with _lock:
+            cache = _caches[directory]
+            for key in [key for key in cache if not os.path.exists(os.path.join(directory, key))]:
+                del cache[key]
+            payload = json.dumps(cache)
+        try:
+            _write(directory, payload)
+        except OSError as e:
+            logging.warning(f"Could not save hash cache for {directory}: {e}")
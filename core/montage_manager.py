@@ -1,40 +1,53 @@
 # core/montage_manager.py
+import copy
+import functools
 import mne
 import numpy as np
 
+_MONTAGE_10_NAMES = ('EEG F3', 'EEG F4', 'EEG C3', 'EEG C4', 'EEG P3', 'EEG P4', 'EEG O1', 'EEG O2', 'EEG A2', 'EEG A1')
+_MONTAGE_10_COORDS = np.array([
+    [-0.05, 0.0375, 0.06], [0.05, 0.0375, 0.06],
+    [-0.05, 0.0, 0.1], [0.05, 0.0, 0.1],
+    [-0.05, -0.0375, 0.08], [0.05, -0.0375, 0.08],
+    [-0.05, -0.075, 0.05], [0.05, -0.075, 0.05],
+    [0.1, 0.0, -0.002], [-0.1, 0.0, -0.002]
+])
+_MONTAGE_19_NAMES = (
+    'EEG FP1-A1', 'EEG FP2-A2', 'EEG F3-A1', 'EEG F4-A2',
+    'EEG C3-A1', 'EEG C4-A2', 'EEG P3-A1', 'EEG P4-A2',
+    'EEG O1-A1', 'EEG O2-A2', 'EEG F7-A1', 'EEG F8-A2',
+    'EEG T3-A1', 'EEG T4-A2', 'EEG T5-A1', 'EEG T6-A2',
+    'EEG FZ-A2', 'EEG CZ-A1', 'EEG PZ-A2'
+)
+_MONTAGE_19_COORDS = np.array([
+    [-0.05, 0.075, 0.05], [0.05, 0.075, 0.05],
+    [-0.05, 0.0375, 0.06], [0.05, 0.0375, 0.06],
+    [-0.05, 0.0, 0.1], [0.05, 0.0, 0.1],
+    [-0.05, -0.0375, 0.08], [0.05, -0.0375, 0.08],
+    [-0.05, -0.075, 0.05], [0.05, -0.075, 0.05],
+    [-0.075, 0.0375, 0.06], [0.075, 0.0375, 0.06],
+    [-0.075, 0.0, 0.1], [0.075, 0.0, 0.1],
+    [-0.075, -0.0375, 0.08], [0.075, -0.0375, 0.08],
+    [0.0, 0.0375, 0.06], [0.0, 0.0, 0.1], [0.0, -0.0375, 0.08]
+])
+
 class MontageManager:
     """Class for creating montages (electrode arrangements) for EEG."""
     @staticmethod
     def create_montage(num_channels):
         """Creates a montage based on the number of channels."""
+        montage = MontageManager._build_montage(num_channels)
+        # set_montage may modify the montage, so callers get their own copy
+        return copy.deepcopy(montage) if montage else None
+
+    @staticmethod
+    @functools.lru_cache(maxsize=4)
+    def _build_montage(num_channels):
+        """Builds the montage for a channel count once and caches it."""
         if num_channels in [10, 11]:
-            ch_n = ['EEG F3', 'EEG F4', 'EEG C3', 'EEG C4', 'EEG P3', 'EEG P4', 'EEG O1', 'EEG O2', 'EEG A2', 'EEG A1']
-            ch_c = np.array([
-                [-0.05, 0.0375, 0.06], [0.05, 0.0375, 0.06],
-                [-0.05, 0.0, 0.1], [0.05, 0.0, 0.1],
-                [-0.05, -0.0375, 0.08], [0.05, -0.0375, 0.08],
-                [-0.05, -0.075, 0.05], [0.05, -0.075, 0.05],
-                [0.1, 0.0, -0.002], [-0.1, 0.0, -0.002]
-            ])
+            ch_n, ch_c = _MONTAGE_10_NAMES, _MONTAGE_10_COORDS
         elif num_channels in [19, 20]:
-            ch_n = [
-                'EEG FP1-A1', 'EEG FP2-A2', 'EEG F3-A1', 'EEG F4-A2',
-                'EEG C3-A1', 'EEG C4-A2', 'EEG P3-A1', 'EEG P4-A2',
-                'EEG O1-A1', 'EEG O2-A2', 'EEG F7-A1', 'EEG F8-A2',
-                'EEG T3-A1', 'EEG T4-A2', 'EEG T5-A1', 'EEG T6-A2',
-                'EEG FZ-A2', 'EEG CZ-A1', 'EEG PZ-A2'
-            ]
-            ch_c = np.array([
-                [-0.05, 0.075, 0.05], [0.05, 0.075, 0.05],
-                [-0.05, 0.0375, 0.06], [0.05, 0.0375, 0.06],
-                [-0.05, 0.0, 0.1], [0.05, 0.0, 0.1],
-                [-0.05, -0.0375, 0.08], [0.05, -0.0375, 0.08],
-                [-0.05, -0.075, 0.05], [0.05, -0.075, 0.05],
-                [-0.075, 0.0375, 0.06], [0.075, 0.0375, 0.06],
-                [-0.075, 0.0, 0.1], [0.075, 0.0, 0.1],
-                [-0.075, -0.0375, 0.08], [0.075, -0.0375, 0.08],
-                [0.0, 0.0375, 0.06], [0.0, 0.0, 0.1], [0.0, -0.0375, 0.08]
-            ])
+            ch_n, ch_c = _MONTAGE_19_NAMES, _MONTAGE_19_COORDS
         else:
             return None
         dig_pts = [
@@ -43,4 +56,4 @@ class MontageManager:
                  coord_frame=mne.io.constants.FIFF.FIFFV_COORD_HEAD)
             for i, (name, coord) in enumerate(zip(ch_n, ch_c))
         ]
-        return mne.channels.DigMontage(dig=dig_pts, ch_names=ch_n)
\ No newline at end of file
+        return mne.channels.DigMontage(dig=dig_pts, ch_names=list(ch_n))
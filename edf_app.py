@@ -1,31 +1,81 @@
 # edf_app.py
+import atexit
 import logging
+import math
 import os
+import queue
+import re
+import threading
 import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from tkinter import filedialog, messagebox, scrolledtext, ttk
-from typing import Optional
-from tabulate import tabulate
+from tkinter import font as tkfont
+from typing import TYPE_CHECKING, Optional
 from config.settings import settings
+from core import hash_cache
 from core.db_manager import DBManager
-from core.edf_processor import EDFProcessor
-from core.edf_segmentor import EDFSegmentor
+
+if TYPE_CHECKING:
+    # MNE, pandas and matplotlib come in with these; they are imported on first use
+    from core.edf_processor import EDFProcessor
+    from core.edf_segmentor import EDFSegmentor
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
+LOG_DRAIN_INTERVAL_MS = 50
+LOG_DRAIN_BATCH = 200
+MAX_OUTPUT_LINES = 5000
+# Partial input accepted by the duration entry while typing, e.g. "", ".", "2." or ".5"
+DURATION_INPUT_RE = re.compile(r"\d*\.?\d*")
+
+class _DiscardOutput:
+    """Text widget stand-in for segmentors running off the Tk thread; batch progress is logged separately."""
+    def insert(self, index, text):
+        pass
+
+    def delete(self, first, last=None):
+        pass
+
 class EDFApp:
     def __init__(self, master):
         self.master = master
         self.master.title("EDF File Manager")
         self.master.geometry("1700x700")
         self.directory = ""
-        self.processor: Optional[EDFProcessor] = None
-        self.segmentor: Optional[EDFSegmentor] = None
+        self.processor: Optional["EDFProcessor"] = None
+        self.segmentor: Optional["EDFSegmentor"] = None
         self.db_manager: Optional[DBManager] = None
         self.current_edf_file: Optional[str] = None
         self._cancel_processing = False
+        self._out_buf: list = []
+        self._out_flush_pending = False
+        self._log_q: queue.Queue = queue.Queue()
+        self._db_lock = threading.Lock()
+        self._worker_state = threading.local()
+        self._batch_progress = None
+        self._edf_list_cache = None
+        self._last_split_params = None
+        self._hash_executor = ThreadPoolExecutor(max_workers=1)
+        self._busy_operation: Optional[str] = None
+        self._file_hash_future = None
+        self._tooltip = None
+        self._tooltip_label = None
         self._setup_ui()
+        self.master.protocol("WM_DELETE_WINDOW", self._on_exit)
+        self.master.after(LOG_DRAIN_INTERVAL_MS, self._drain_log)
+        atexit.register(hash_cache.flush)
         self._try_autoload_db()
 
+    def _on_exit(self):
+        self._cancel_processing = True
+        self._close_db_manager()
+        self.master.quit()
+
+    def _close_db_manager(self):
+        if getattr(self, 'db_manager', None):
+            self.db_manager.close()
+            self.db_manager = None
+
     def _setup_ui(self):
         main_container = tk.Frame(self.master)
         main_container.pack(fill=tk.BOTH, expand=True)
@@ -36,16 +86,19 @@ class EDFApp:
         self.top_panel = tk.Frame(top_container)
         self.top_panel.pack(side=tk.LEFT, fill=tk.X, expand=True)
 
-        exit_btn = tk.Button(
+        exit_btn = ttk.Button(
             top_container,
             text="Exit",
             width=10,
-            command=self.master.quit
+            command=self._on_exit
         )
         exit_btn.pack(side=tk.RIGHT, padx=5)
         self._create_tooltip(exit_btn, "Exit application")
 
+        ttk.Style(self.master).configure("TButton", padding=2)
         self.notebook = ttk.Notebook(self.top_panel)
+        self._dir_dep_btns = []
+        self.folder_buttons = {}
         self.notebook.pack(fill=tk.X, expand=True)
 
         self._setup_folder_processing_tab()
@@ -57,10 +110,11 @@ class EDFApp:
         tab = ttk.Frame(self.notebook)
         self.notebook.add(tab, text="Database")
 
-        frame = tk.Frame(tab)
+        frame = ttk.Frame(tab)
         frame.pack(fill=tk.X, padx=5, pady=5)
 
         self.db_buttons = {}
+        self._db_dep_btns = []
         buttons = [
             ("Create DB", self.create_database, "Create new database"),
             ("Delete DB", self.delete_database, "Delete database"),
@@ -71,7 +125,7 @@ class EDFApp:
         ]
 
         for text, command, tooltip in buttons:
-            btn = tk.Button(
+            btn = ttk.Button(
                 frame,
                 text=text,
                 width=10,
@@ -81,7 +135,12 @@ class EDFApp:
             btn.pack(side=tk.LEFT, padx=2, pady=2)
             self._create_tooltip(btn, tooltip)
             self.db_buttons[text] = btn
+            if text != "Create DB":
+                self._db_dep_btns.append(btn)
 
+        self._status_font = tkfont.Font(family="Arial", size=9)
+        self._status_font_bold = tkfont.Font(family="Arial", size=9, weight="bold")
+        self._last_db_status = None
         self.db_status_label = tk.Label(
             frame,
             text="[DB Not Created]",
@@ -93,7 +152,7 @@ class EDFApp:
         tab = ttk.Frame(self.notebook)
         self.notebook.add(tab, text="EDF Processing")
 
-        frame = tk.Frame(tab)
+        frame = ttk.Frame(tab)
         frame.pack(fill=tk.X, padx=5, pady=5)
 
         buttons = [
@@ -110,7 +169,7 @@ class EDFApp:
         ]
 
         for text, command, tooltip in buttons:
-            btn = tk.Button(
+            btn = ttk.Button(
                 frame,
                 text=text,
                 width=10,
@@ -119,15 +178,18 @@ class EDFApp:
             )
             btn.pack(side=tk.LEFT, padx=2, pady=2)
             self._create_tooltip(btn, tooltip)
+            self.folder_buttons[text] = btn
+            if text != "Open":
+                self._dir_dep_btns.append(btn)
 
     def _setup_segmentation_tab(self):
         tab = ttk.Frame(self.notebook)
         self.notebook.add(tab, text="Segmentation")
 
-        frame = tk.Frame(tab)
+        frame = ttk.Frame(tab)
         frame.pack(fill=tk.X, padx=5, pady=5)
 
-        self.btn_load_edf = tk.Button(
+        self.btn_load_edf = ttk.Button(
             frame,
             text="Load EDF",
             width=10,
@@ -137,7 +199,7 @@ class EDFApp:
         self.btn_load_edf.pack(side=tk.LEFT, padx=2, pady=2)
         self._create_tooltip(self.btn_load_edf, "Load EDF file for segmentation")
 
-        self.btn_split = tk.Button(
+        self.btn_split = ttk.Button(
             frame,
             text="Split",
             width=10,
@@ -147,13 +209,19 @@ class EDFApp:
         self.btn_split.pack(side=tk.LEFT, padx=2, pady=2)
         self._create_tooltip(self.btn_split, "Split EDF file into segments")
 
-        tk.Label(frame, text="Min (sec):").pack(side=tk.LEFT, padx=2, pady=2)
+        ttk.Label(frame, text="Min (sec):").pack(side=tk.LEFT, padx=2, pady=2)
 
-        self.min_duration_entry = tk.Entry(frame, width=6)
-        self.min_duration_entry.insert(0, str(settings.MIN_SEGMENT_DURATION))
+        self.min_duration_var = tk.DoubleVar(value=settings.MIN_SEGMENT_DURATION)
+        self.min_duration_entry = ttk.Entry(
+            frame,
+            width=6,
+            textvariable=self.min_duration_var,
+            validate="key",
+            validatecommand=(self.master.register(self._is_duration_input), "%P")
+        )
         self.min_duration_entry.pack(side=tk.LEFT, padx=2, pady=2)
 
-        self.btn_set_duration = tk.Button(
+        self.btn_set_duration = ttk.Button(
             frame,
             text="Set Duration",
             width=10,
@@ -161,6 +229,7 @@ class EDFApp:
         )
         self.btn_set_duration.pack(side=tk.LEFT, padx=2, pady=2)
         self._create_tooltip(self.btn_set_duration, "Set minimum segment duration")
+        self._dir_dep_btns.extend((self.btn_load_edf, self.btn_split, self.btn_set_duration))
 
         self.current_file_label = tk.Label(
             frame,
@@ -185,23 +254,52 @@ class EDFApp:
         self.context_menu.add_command(label="Copy", command=self._copy_text)
         self.text_output.bind("<Button-3>", self._show_context_menu)
 
-    def _create_tooltip(self, widget, text):
-        tooltip = tk.Toplevel(widget)
-        tooltip.wm_overrideredirect(True)
-        tooltip.wm_geometry("+0+0")
-        tooltip.withdraw()
-        label = tk.Label(tooltip, text=text, background="#ffffe0", relief="solid", borderwidth=1)
-        label.pack()
-        widget.bind("<Enter>", lambda e: self._show_tooltip(tooltip, widget))
-        widget.bind("<Leave>", lambda e: tooltip.withdraw())
+    def _out(self, text):
+        # Worker threads must not touch Tk; their output is handed over through the log queue
+        if threading.current_thread() is not threading.main_thread():
+            self._log_q.put(('log', text))
+            return
+        self._out_buf.append(text)
+        if not self._out_flush_pending:
+            self._out_flush_pending = True
+            self.master.after_idle(self._flush_out)
+
+    def _flush_out(self):
+        self._out_flush_pending = False
+        if self._out_buf:
+            self.text_output.insert(tk.END, "".join(self._out_buf))
+            self._out_buf.clear()
+            # Oldest lines are dropped so long batch runs don't keep growing the widget
+            lines = int(self.text_output.index("end-1c").split(".")[0])
+            if lines > MAX_OUTPUT_LINES:
+                self.text_output.delete("1.0", f"{lines - MAX_OUTPUT_LINES + 1}.0")
+            self.text_output.see(tk.END)
+
+    def _clear_out(self):
+        self._out_buf.clear()
+        self.text_output.delete(1.0, tk.END)
 
-    @staticmethod
-    def _show_tooltip(tooltip, widget):
+    def _create_tooltip(self, widget, text):
+        widget.bind("<Enter>", lambda e: self._show_tooltip(widget, text))
+        widget.bind("<Leave>", lambda e: self._hide_tooltip())
+
+    def _show_tooltip(self, widget, text):
+        if self._tooltip is None:
+            self._tooltip = tk.Toplevel(self.master)
+            self._tooltip.wm_overrideredirect(True)
+            self._tooltip.withdraw()
+            self._tooltip_label = tk.Label(self._tooltip, background="#ffffe0", relief="solid", borderwidth=1)
+            self._tooltip_label.pack()
+        self._tooltip_label.config(text=text)
         x, y, _, _ = widget.bbox("insert")
         x += widget.winfo_rootx() + 25
         y += widget.winfo_rooty() + 25
-        tooltip.wm_geometry(f"+{x}+{y}")
-        tooltip.deiconify()
+        self._tooltip.wm_geometry(f"+{x}+{y}")
+        self._tooltip.deiconify()
+
+    def _hide_tooltip(self):
+        if self._tooltip is not None:
+            self._tooltip.withdraw()
 
     def _copy_text(self, event=None):
         try:
@@ -231,29 +329,30 @@ class EDFApp:
         if hasattr(self, 'db_manager') and self.db_manager:
             db_name = os.path.basename(self.db_manager.db_path)
             size = os.path.getsize(self.db_manager.db_path) / 1024
-            self.db_status_label.config(
-                text=f"DB: {db_name} ({size:.1f} KB)",
-                fg="green",
-                font=("Arial", 9, "bold")
-            )
+            status = f"DB: {db_name} ({size:.1f} KB)"
+        else:
+            status = None
+        if status is not None and not self._busy_operation:
             self._enable_db_buttons()
         else:
-            self.db_status_label.config(
-                text="[DB Not Created]",
-                fg="red",
-                font=("Arial", 9)
-            )
             self._disable_db_buttons()
+        # The label is only reconfigured when the displayed status changes
+        if status == self._last_db_status:
+            return
+        self._last_db_status = status
+        if status is not None:
+            self.db_status_label.config(text=status, fg="green", font=self._status_font_bold)
+        else:
+            self.db_status_label.config(text="[DB Not Created]", fg="red", font=self._status_font)
 
     def _enable_db_buttons(self):
-        for btn_text, btn in self.db_buttons.items():
-            if btn_text != "Create DB":
-                btn.config(state=tk.NORMAL if hasattr(self, 'db_manager') and self.db_manager else tk.DISABLED)
+        state = tk.NORMAL if hasattr(self, 'db_manager') and self.db_manager else tk.DISABLED
+        for btn in self._db_dep_btns:
+            btn.config(state=state)
 
     def _disable_db_buttons(self):
-        for btn_text, btn in self.db_buttons.items():
-            if btn_text != "Create DB":
-                btn.config(state=tk.DISABLED)
+        for btn in self._db_dep_btns:
+            btn.config(state=tk.DISABLED)
 
     def _try_autoload_db(self):
         if not self.directory:
@@ -261,11 +360,22 @@ class EDFApp:
         db_path = os.path.join(self.directory, "DB", "eeg_database.db")
         if os.path.exists(db_path):
             try:
+                self._close_db_manager()
                 self.db_manager = DBManager(self.directory)
                 self._update_db_status()
-                self.text_output.insert(tk.END, "Automatically loaded existing database\n")
+                self._out("Automatically loaded existing database\n")
             except Exception as e:
-                self.text_output.insert(tk.END, f"Error loading database: {str(e)}\n")
+                self._out(f"Error loading database: {str(e)}\n")
+
+    def _list_edf_files(self):
+        dir_mtime = os.stat(self.directory).st_mtime_ns
+        if self._edf_list_cache and self._edf_list_cache[0] == (self.directory, dir_mtime):
+            return self._edf_list_cache[1]
+        with os.scandir(self.directory) as entries:
+            edf_files = [e.name for e in entries
+                         if e.is_file(follow_symlinks=False) and e.name.lower().endswith('.edf')]
+        self._edf_list_cache = ((self.directory, dir_mtime), edf_files)
+        return edf_files
 
     def batch_process_edf_files(self):
         if not self.directory:
@@ -275,72 +385,131 @@ class EDFApp:
             messagebox.showwarning("Error", "Please create a database first")
             return
 
-        edf_files = [f for f in os.listdir(self.directory) if f.lower().endswith('.edf')]
+        edf_files = self._list_edf_files()
         if not edf_files:
             messagebox.showinfo("Information", "No EDF files found in the selected directory")
             return
+        if not self._begin_operation("batch processing"):
+            return
 
-        progress_window, progress_var, status_label = self._create_progress_window(len(edf_files))
-        self.text_output.delete(1.0, tk.END)
-        self.text_output.insert(tk.END, f"Starting batch processing of {len(edf_files)} files...\n")
-
-        total_segments = 0
-        processed_files = 0
+        self._batch_progress = self._create_progress_window(len(edf_files))
+        self._clear_out()
+        self._out(f"Starting batch processing of {len(edf_files)} files...\n")
         self._cancel_processing = False
 
+        file_paths = [os.path.join(self.directory, f) for f in edf_files]
+        ingested = self.db_manager.get_ingested_hashes()
+        threading.Thread(target=self._run_batch, args=(file_paths, self.db_manager, ingested), daemon=True).start()
+
+    def _run_batch(self, file_paths, db_manager, ingested):
         try:
-            for i, edf_file in enumerate(edf_files, 1):
-                if self._cancel_processing:
-                    self.text_output.insert(tk.END, "\nProcessing cancelled by user\n")
-                    break
-
-                try:
-                    progress_var.set(i)
-                    status_label.config(text=f"Processing file {i} of {len(edf_files)}: {edf_file}")
-                    progress_window.update()
-
-                    file_path = os.path.join(self.directory, edf_file)
-                    self.text_output.insert(tk.END, f"\nProcessing file: {edf_file}\n")
-                    self.text_output.update_idletasks()
-
-                    segmentor = EDFSegmentor(self.text_output)
-                    segmentor.load_metadata(file_path)
-                    segmentor.process()
-
-                    if segmentor.seg_dict:
-                        try:
-                            patient_id, edf_id = self.db_manager.fill_segments_from_dict(
-                                segmentor.seg_dict,
-                                file_path
-                            )
-                            segments_added = len(segmentor.seg_dict)
-                            total_segments += segments_added
-                            self.text_output.insert(
-                                tk.END,
-                                f"Added {segments_added} segments to DB (Patient ID: {patient_id}, EDF ID: {edf_id})\n"
-                            )
-                            processed_files += 1
-                        except ValueError as e:
-                            self.text_output.insert(tk.END, f"Database insertion error: {str(e)}\n")
-                    else:
-                        self.text_output.insert(tk.END, "File contains no segments to add\n")
-
-                except Exception as e:
-                    self.text_output.insert(tk.END, f"Error processing file {edf_file}: {str(e)}\n")
-                    logging.error(f"Error processing {edf_file}: {e}")
-                    continue
-
-            completion_msg = "\nBatch processing cancelled\n" if self._cancel_processing else "\nBatch processing completed!\n"
-            self.text_output.insert(
-                tk.END,
-                f"{completion_msg}"
-                f"Files processed: {processed_files}/{len(edf_files)}\n"
-                f"Total segments added: {total_segments}\n"
-            )
+            self._run_batch_files(file_paths, db_manager, ingested)
+        finally:
+            hash_cache.flush()
 
+    def _run_batch_files(self, file_paths, db_manager, ingested):
+        total_segments = 0
+        processed_files = 0
+        try:
+            with ThreadPoolExecutor(max_workers=settings.MAX_WORKERS) as executor:
+                futures = {executor.submit(self._process_one, path, db_manager, ingested): path for path in file_paths}
+                for i, future in enumerate(as_completed(futures), 1):
+                    segments_added = future.result()
+                    if segments_added is not None:
+                        total_segments += segments_added
+                        processed_files += 1
+                    self._log_q.put(('progress', (i, len(file_paths), os.path.basename(futures[future]))))
         finally:
-            progress_window.destroy()
-            self._update_db_status()
+            if self._cancel_processing:
+                self._log_q.put(('log', "\nProcessing cancelled by user\n"))
+            self._log_q.put(('done', (processed_files, len(file_paths), total_segments)))
+
+    def _process_one(self, file_path, db_manager, ingested):
+        edf_file = os.path.basename(file_path)
+        if self._cancel_processing:
+            return None
+        try:
+            file_hash = hash_cache.get_or_compute(
+                os.path.dirname(file_path), file_path, DBManager._calculate_file_hash, "sha256")
+            if file_hash in ingested:
+                self._log_q.put(('log', f"{edf_file}: already in database, skipped\n"))
+                return None
+            self._log_q.put(('log', f"\nProcessing file: {edf_file}\n"))
+            segmentor = self._worker_segmentor()
+            segmentor.reset()
+            segmentor.load_metadata(file_path)
+            segmentor.process()
+
+            if not segmentor.seg_dict:
+                self._log_q.put(('log', f"{edf_file}: file contains no segments to add\n"))
+                return None
+            try:
+                with self._db_lock:
+                    patient_id, edf_id = db_manager.fill_segments_from_dict(segmentor.seg_dict, file_path, file_hash)
+            except ValueError as e:
+                self._log_q.put(('log', f"{edf_file}: database insertion error: {str(e)}\n"))
+                return None
+            segments_added = len(segmentor.seg_dict)
+            self._log_q.put((
+                'log',
+                f"{edf_file}: added {segments_added} segments to DB (Patient ID: {patient_id}, EDF ID: {edf_id})\n"
+            ))
+            return segments_added
+        except Exception as e:
+            self._log_q.put(('log', f"Error processing file {edf_file}: {str(e)}\n"))
+            logging.error(f"Error processing {edf_file}: {e}")
+            return None
+
+    def _worker_segmentor(self):
+        segmentor = getattr(self._worker_state, 'segmentor', None)
+        if segmentor is None:
+            from core.edf_segmentor import EDFSegmentor
+            segmentor = self._worker_state.segmentor = EDFSegmentor(_DiscardOutput())
+        return segmentor
+
+    def _drain_log(self):
+        # Only the latest progress tick of each drain is shown, so the bar redraws at most once per interval
+        progress = None
+        try:
+            for _ in range(LOG_DRAIN_BATCH):
+                kind, payload = self._log_q.get_nowait()
+                if kind == 'log':
+                    self._out(payload)
+                elif kind == 'progress':
+                    progress = payload
+                elif kind == 'done':
+                    if progress:
+                        self._on_batch_progress(*progress)
+                        progress = None
+                    self._on_batch_done(*payload)
+                elif kind == 'op_done':
+                    self._on_operation_done(*payload)
+                elif kind == 'op_error':
+                    self._on_operation_error(*payload)
+        except queue.Empty:
+            pass
+        if progress:
+            self._on_batch_progress(*progress)
+        self.master.after(LOG_DRAIN_INTERVAL_MS, self._drain_log)
+
+    def _on_batch_progress(self, done, total, edf_file):
+        if self._batch_progress:
+            _, progress_var, status_label = self._batch_progress
+            progress_var.set(done)
+            status_label.config(text=f"Processed file {done} of {total}: {edf_file}")
+
+    def _on_batch_done(self, processed_files, total_files, total_segments):
+        completion_msg = "\nBatch processing cancelled\n" if self._cancel_processing else "\nBatch processing completed!\n"
+        self._out(
+            f"{completion_msg}"
+            f"Files processed: {processed_files}/{total_files}\n"
+            f"Total segments added: {total_segments}\n"
+        )
+        if self._batch_progress:
+            self._batch_progress[0].destroy()
+            self._batch_progress = None
+        self._edf_list_cache = None
+        self._end_operation()
 
     def _create_progress_window(self, total_files):
         progress_window = tk.Toplevel(self.master)
@@ -384,19 +553,20 @@ class EDFApp:
             os.makedirs(db_folder, exist_ok=True)
             if os.path.exists(db_path):
                 if not messagebox.askyesno("Confirmation", "Database already exists. Recreate?"):
-                    self.text_output.insert(tk.END, "Database already exists.\n")
+                    self._out("Database already exists.\n")
                     return
+            self._close_db_manager()
             self.db_manager = DBManager(self.directory)
             if not self.db_manager.database_exists():
                 raise RuntimeError("Failed to create database file")
-            self.text_output.insert(tk.END, f"Database created at:\n{db_path}\n")
+            self._out(f"Database created at:\n{db_path}\n")
             self._update_db_status()
-            if not any(f.lower().endswith('.edf') for f in os.listdir(self.directory)):
+            if not self._list_edf_files():
                 messagebox.showwarning("Warning", "No EDF files found in the directory.")
 
         except Exception as e:
             error_msg = f"Error creating database: {str(e)}"
-            self.text_output.insert(tk.END, error_msg + "\n")
+            self._out(error_msg + "\n")
             messagebox.showerror("Database Error", error_msg)
             if hasattr(self, 'db_manager'):
                 del self.db_manager
@@ -418,28 +588,25 @@ class EDFApp:
             return
 
         try:
-            if hasattr(self.db_manager, 'close_connection'):
-                self.db_manager.close_connection()
-            elif hasattr(self.db_manager, 'conn') and self.db_manager.conn:
-                self.db_manager.conn.close()
+            self._close_db_manager()
 
             if os.path.exists(db_path):
                 os.remove(db_path)
-                self.text_output.insert(tk.END, f"Database file '{db_name}' deleted.\n")
+                self._out(f"Database file '{db_name}' deleted.\n")
 
             segments_dir = os.path.join(os.path.dirname(db_path), "segments")
             if os.path.exists(segments_dir):
                 import shutil
                 shutil.rmtree(segments_dir)
-                self.text_output.insert(tk.END, f"Segments directory deleted.\n")
+                self._out(f"Segments directory deleted.\n")
 
-            self.db_manager = None
+            self._edf_list_cache = None
             self._update_db_status()
-            self.text_output.insert(tk.END, f"Database '{db_name}' successfully deleted\n")
+            self._out(f"Database '{db_name}' successfully deleted\n")
 
         except Exception as e:
             error_msg = f"Error deleting database: {str(e)}"
-            self.text_output.insert(tk.END, error_msg + "\n")
+            self._out(error_msg + "\n")
             messagebox.showerror("Error", error_msg)
 
     def fill_segments(self):
@@ -451,38 +618,41 @@ class EDFApp:
             return
 
         try:
+            file_hash = None
             file_path = getattr(self.segmentor, 'current_file_path', None)
-            if not file_path:
+            if file_path:
+                file_hash = self._file_hash_future.result() if self._file_hash_future else None
+            else:
                 file_path = filedialog.askopenfilename(filetypes=[("EDF files", "*.edf")])
                 if not file_path:
                     return
 
             patient_id, edf_id = self.db_manager.fill_segments_from_dict(
                 self.segmentor.seg_dict,
-                file_path
+                file_path,
+                file_hash
             )
-            self.text_output.insert(tk.END,
-                                  f"Successfully added segments to database. Patient ID: {patient_id}, EDF ID: {edf_id}\n")
+            self._out(f"Successfully added segments to database. Patient ID: {patient_id}, EDF ID: {edf_id}\n")
             self.show_db_stats()
         except Exception as e:
-            self.text_output.insert(tk.END, f"Error adding segments: {e}\n")
+            self._out(f"Error adding segments: {e}\n")
             messagebox.showerror("Error", f"Failed to add segments: {e}")
 
     def show_db_stats(self):
-        self.text_output.delete(1.0, tk.END)
+        self._clear_out()
         if not hasattr(self, 'db_manager') or not self.db_manager:
-            self.text_output.insert(tk.END, "Database not initialized. Please create database first.\n")
+            self._out("Database not initialized. Please create database first.\n")
             return
 
         try:
             stats = self.db_manager.get_database_stats()
-            self.text_output.insert(tk.END, "Database Statistics:\n")
-            self.text_output.insert(tk.END, f"Patients: {stats['patients']}\n")
-            self.text_output.insert(tk.END, f"EDF Files: {stats['edf_files']}\n")
-            self.text_output.insert(tk.END, f"Segments: {stats['segments']}\n")
-            self.text_output.insert(tk.END, f"Diagnoses: {stats['diagnoses']}\n")
+            self._out("Database Statistics:\n")
+            self._out(f"Patients: {stats['patients']}\n")
+            self._out(f"EDF Files: {stats['edf_files']}\n")
+            self._out(f"Segments: {stats['segments']}\n")
+            self._out(f"Diagnoses: {stats['diagnoses']}\n")
         except Exception as e:
-            self.text_output.insert(tk.END, f"Error getting database stats: {e}\n")
+            self._out(f"Error getting database stats: {e}\n")
 
     def edit_database(self):
         if not self.db_manager:
@@ -495,12 +665,23 @@ class EDFApp:
         editor_window.wait_visibility()
         editor_window.grab_set()
 
+    @staticmethod
+    def _is_duration_input(proposed):
+        return DURATION_INPUT_RE.fullmatch(proposed) is not None
+
+    def _read_min_duration(self):
+        try:
+            min_duration = self.min_duration_var.get()
+        except tk.TclError:
+            min_duration = 0.0
+        if not math.isfinite(min_duration) or min_duration <= 0:
+            raise ValueError("Duration must be a finite number greater than 0.")
+        settings.MIN_SEGMENT_DURATION = min_duration
+        return min_duration
+
     def apply_min_duration(self):
         try:
-            min_duration = float(self.min_duration_entry.get())
-            if min_duration <= 0:
-                raise ValueError("Duration must be greater than 0.")
-            settings.MIN_SEGMENT_DURATION = min_duration
+            min_duration = self._read_min_duration()
             messagebox.showinfo("Success", f"Minimum duration set: {min_duration} sec.")
         except ValueError as e:
             messagebox.showerror("Error", str(e))
@@ -508,57 +689,98 @@ class EDFApp:
     def split_into_segments(self):
         if self.segmentor:
             try:
-                min_duration = float(self.min_duration_entry.get())
-                if min_duration <= 0:
-                    raise ValueError("Duration must be greater than 0.")
-                settings.MIN_SEGMENT_DURATION = min_duration
+                min_duration = self._read_min_duration()
+                split_params = (self.segmentor.current_file_path, min_duration)
+                if split_params == self._last_split_params:
+                    self._out(f"Segments for min duration {min_duration} sec are already computed (cached).\n")
+                    return
                 self.segmentor.process()
+                self._last_split_params = split_params
             except ValueError as e:
                 messagebox.showerror("Error", str(e))
 
     def select_directory(self):
         self.directory = filedialog.askdirectory()
+        self._edf_list_cache = None
         if self.directory:
-            self.text_output.insert(tk.END, f"Selected directory: {self.directory}\n")
+            self._out(f"Selected directory: {self.directory}\n")
+            from core.edf_processor import EDFProcessor
             self.processor = EDFProcessor(self.directory)
 
-            for tab in self.notebook.winfo_children():
-                for widget in tab.winfo_children():
-                    if isinstance(widget, tk.Frame):
-                        for btn in widget.winfo_children():
-                            if isinstance(btn, tk.Button) and btn["text"] != "Open":
-                                btn.config(state=tk.NORMAL)
+            for btn in self._dir_dep_btns + self._db_dep_btns:
+                btn.config(state=tk.NORMAL)
 
-            self.btn_load_edf.config(state=tk.NORMAL)
             self._try_autoload_db()
 
     def load_edf_file(self):
         file_path = filedialog.askopenfilename(filetypes=[("EDF files", "*.edf")])
         if file_path:
-            self.segmentor = EDFSegmentor(self.text_output)
-            self.segmentor.current_file_path = file_path
-            self.segmentor.load_metadata(file_path)
+            if self.segmentor is None:
+                from core.edf_segmentor import EDFSegmentor
+                self.segmentor = EDFSegmentor(self.text_output)
+            self._file_hash_future = self._hash_executor.submit(
+                hash_cache.get_or_compute,
+                os.path.dirname(file_path), file_path, DBManager._calculate_file_hash, "sha256")
+            # Reloading an unchanged file keeps its metadata and segments, so a later Split stays cached
+            split_params, self._last_split_params = self._last_split_params, None
+            if self.segmentor.load_metadata(file_path):
+                self._last_split_params = split_params
             self.btn_split.config(state=tk.NORMAL)
             if self.db_manager:
                 self.db_buttons["Fill DB"].config(state=tk.NORMAL)
 
+    def _begin_operation(self, operation_name):
+        # Operations rename and delete files, so only one may touch the directory at a time
+        if self._busy_operation:
+            messagebox.showwarning("Busy", f"Please wait until the {self._busy_operation} finishes.")
+            return False
+        self._busy_operation = operation_name
+        for btn in list(self.folder_buttons.values()) + list(self.db_buttons.values()) + self._dir_dep_btns:
+            btn.config(state=tk.DISABLED)
+        return True
+
+    def _end_operation(self):
+        self._busy_operation = None
+        self.folder_buttons["Open"].config(state=tk.NORMAL)
+        self.db_buttons["Create DB"].config(state=tk.NORMAL)
+        if self.directory:
+            for btn in self._dir_dep_btns:
+                btn.config(state=tk.NORMAL)
+        self._update_db_status()
+
     def _execute_operation(self, operation_name, operation_func):
         if not self.directory:
             messagebox.showwarning("Error", "Directory not selected.")
             return
+        if not self._begin_operation(operation_name):
+            return
 
-        self.text_output.insert(tk.END, f"Started {operation_name}...\n")
-        self.text_output.update_idletasks()
+        self._out(f"Started {operation_name}...\n")
+        threading.Thread(
+            target=self._run_operation,
+            args=(operation_name, operation_func),
+            daemon=True
+        ).start()
 
+    def _run_operation(self, operation_name, operation_func):
         try:
             result = operation_func()
-            self.text_output.insert(tk.END, f"{operation_name.capitalize()} completed.\n")
-            if result:
-                self.text_output.insert(tk.END, f"Result: {result}\n")
         except Exception as e:
             logging.error(f"Error during {operation_name}: {e}")
-            self.text_output.insert(tk.END, f"Error: {e}\n")
-            messagebox.showerror("Error", f"An error occurred: {e}")
+            self._log_q.put(('op_error', (operation_name, e)))
+        else:
+            self._log_q.put(('op_done', (operation_name, result)))
+
+    def _on_operation_done(self, operation_name, result):
+        self._out(f"{operation_name.capitalize()} completed.\n")
+        if result:
+            self._out(f"Result: {result}\n")
+        self._end_operation()
+
+    def _on_operation_error(self, operation_name, error):
+        self._out(f"Error: {error}\n")
+        self._end_operation()
+        messagebox.showerror("Error", f"An error occurred: {error}")
 
     def rename_files(self):
         self._execute_operation("file renaming process", self.processor.rename_edf_files)
@@ -590,11 +812,11 @@ class EDFApp:
     def _find_and_delete_duplicates(self):
         duplicates = self.processor.find_duplicate_files()
         if duplicates:
-            self.text_output.insert(tk.END, "Duplicate files found:\n")
+            self._out("Duplicate files found:\n")
             for hash_val, paths in duplicates.items():
-                self.text_output.insert(tk.END, f"Hash: {hash_val}\n")
+                self._out(f"Hash: {hash_val}\n")
                 for path in paths:
-                    self.text_output.insert(tk.END, f"  {path}\n")
+                    self._out(f"  {path}\n")
             self.processor.delete_duplicates(duplicates)
             return "Duplicates deleted."
         return "No duplicates found."
@@ -605,26 +827,31 @@ class EDFApp:
         self._display_statistics(stats)
         return "Statistics generated and visualized."
 
+    @staticmethod
+    def _format_metrics(rows):
+        width = max((len(str(label)) for label, _ in rows), default=0)
+        return "".join(f"{str(label):<{width}}  {value}\n" for label, value in rows)
+
     def _display_statistics(self, stats):
-        self.text_output.insert(tk.END, "Descriptive statistics:\n")
+        self._out("Descriptive statistics:\n")
         if 'sex_distribution' in stats and stats['sex_distribution'] is not None:
-            self.text_output.insert(tk.END, "Sex distribution:\n")
-            self.text_output.insert(tk.END, tabulate(stats['sex_distribution'].items(), headers=["Sex", "Count"],
-                                             tablefmt="pretty") + "\n")
+            self._out("Sex distribution:\n")
+            self._out(self._format_metrics(list(stats['sex_distribution'].items())))
         if 'age_distribution' in stats and stats['age_distribution'] is not None:
-            self.text_output.insert(tk.END, "\nAge distribution:\n")
+            self._out("\nAge distribution:\n")
             age_stats = stats['age_distribution']
-            self.text_output.insert(tk.END, tabulate(
-                [["Count", int(age_stats['count'])], ["Mean age", f"{age_stats['mean']:.2f} years"],
-                 ["Minimum age", f"{age_stats['min']} years"], ["Maximum age", f"{age_stats['max']} years"]],
-                headers=["Metric", "Value"], tablefmt="pretty") + "\n")
+            self._out(self._format_metrics([
+                ("Count", int(age_stats['count'])), ("Mean age", f"{age_stats['mean']:.2f} years"),
+                ("Minimum age", f"{age_stats['min']} years"), ("Maximum age", f"{age_stats['max']} years")
+            ]))
         if 'duration_stats' in stats and stats['duration_stats'] is not None:
-            self.text_output.insert(tk.END, "\nRecording duration statistics (minutes):\n")
+            self._out("\nRecording duration statistics (minutes):\n")
             duration_stats = stats['duration_stats']
-            self.text_output.insert(tk.END, tabulate([["Mean duration", f"{duration_stats['mean']:.2f} min"],
-                                              ["Minimum duration", f"{duration_stats['min']:.2f} min"],
-                                              ["Maximum duration", f"{duration_stats['max']:.2f} min"]],
-                                             headers=["Metric", "Value"], tablefmt="pretty") + "\n")
+            self._out(self._format_metrics([
+                ("Mean duration", f"{duration_stats['mean']:.2f} min"),
+                ("Minimum duration", f"{duration_stats['min']:.2f} min"),
+                ("Maximum duration", f"{duration_stats['max']:.2f} min")
+            ]))
 
 if __name__ == "__main__":
     root = tk.Tk()
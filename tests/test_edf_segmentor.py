@@ -0,0 +1,21 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("mne")
+
+from core.edf_segmentor import _build_segments
+
+
+def test_segment_of_exactly_min_duration_is_kept():
+    # 1.1 * 100 == 110.00000000000001, so a ceil-based sample cutoff would reject this segment
+    samples = np.array([0, 110], dtype=np.int64)
+    starts, ends, idx = _build_segments(samples, 300, 100.0, 1.1)
+    assert idx.tolist() == [0, 1]
+    assert starts.tolist() == [0, 110]
+    assert ends.tolist() == [110, 300]
+
+
+def test_segment_shorter_than_min_duration_is_dropped():
+    samples = np.array([0, 109], dtype=np.int64)
+    _, _, idx = _build_segments(samples, 300, 100.0, 1.1)
+    assert idx.tolist() == [1]